@@ -0,0 +1,159 @@
+"""Benchmark offline: login, refresh complet și calculul atributelor senzorilor,
+contra serverului local din `mock_server.py`.
+
+Rulare (din rădăcina repo-ului, cu dependențele din requirements-dev.txt):
+
+    python -m benchmarks.bench --accounts 1 5 20 --latency-ms 30 --rounds 3
+    python -m benchmarks.bench --accounts 10 --failure-rate 0.05 --json > bench_output.txt
+
+Pentru fiecare număr de conturi se raportează timpul (mediana pe runde), numărul de
+cereri HTTP și vârful de memorie alocată (tracemalloc) al fiecărei faze.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from functools import partial
+from types import SimpleNamespace
+from typing import Any
+
+from custom_components.apanova_ro.analytics import ConsumptionAnalytics
+from custom_components.apanova_ro.api import ApanovaClient, ApanovaError
+from custom_components.apanova_ro.models import parse_data, parse_water
+from custom_components.apanova_ro.scheduler import RefreshScheduler
+
+from .mock_server import MockApanova, MockConfig, RewritingSession
+
+
+async def _measure(mock: MockApanova, call: Callable[[], Awaitable[Any]]) -> dict[str, Any]:
+    mock.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    try:
+        await call()
+    except ApanovaError as e:
+        error = str(e)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": elapsed,
+        "requests": sum(mock.requests.values()),
+        "bytes": mock.bytes_sent,
+        "peak_kib": peak / 1024,
+        "error": error,
+    }
+
+
+def _sensors(data: dict[str, Any], client: ApanovaClient) -> list:
+    """Entitățile create de platforma sensor (aceeași fabrică), peste coordonatori falși."""
+    from custom_components.apanova_ro import sensor
+
+    coordinator = SimpleNamespace(
+        data=data,
+        model=parse_data(data),
+        generation=1,
+        last_update_success=True,
+        analytics=ConsumptionAnalytics(),
+        scheduler=RefreshScheduler(),
+        billing={"mode": None, "next_invoice": None, "after_payment": False},
+        poll_mode=None,
+    )
+    shared = SimpleNamespace(data={}, model=parse_water({}), generation=1, last_update_success=True)
+    entry = SimpleNamespace(entry_id="bench", options={})
+    return sensor.build_entities(coordinator, shared, entry, client)
+
+
+async def _refresh(client: ApanovaClient, data: dict[str, Any]) -> None:
+    data.update(await client.refresh_all())
+
+
+async def _compute(data: dict[str, Any], client: ApanovaClient) -> None:
+    # modelul se reconstruiește (ca la un set nou de date), apoi fiecare entitate
+    for entity in _sensors(data, client):
+        entity._compute()
+
+
+async def run_case(config: MockConfig, rounds: int) -> dict[str, Any]:
+    mock = MockApanova(config)
+    base = await mock.start()
+    session = RewritingSession(base)
+    results: dict[str, list[dict[str, Any]]] = {"login": [], "refresh_all": [], "sensors": []}
+    try:
+        for _ in range(rounds):
+            client = ApanovaClient(
+                None, {"email": "bench@example.com", "password": "x"}, session=session
+            )
+            data: dict[str, Any] = {}
+            results["login"].append(await _measure(mock, client.login))
+            results["refresh_all"].append(await _measure(mock, partial(_refresh, client, data)))
+            results["sensors"].append(await _measure(mock, partial(_compute, data, client)))
+    finally:
+        await session.close()
+        await mock.stop()
+    return {phase: _summary(runs) for phase, runs in results.items()}
+
+
+def _summary(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "median_ms": round(statistics.median(r["seconds"] for r in runs) * 1000, 2),
+        "max_ms": round(max(r["seconds"] for r in runs) * 1000, 2),
+        "requests": max(r["requests"] for r in runs),
+        "bytes": max(r["bytes"] for r in runs),
+        "peak_kib": round(max(r["peak_kib"] for r in runs), 1),
+        "errors": [r["error"] for r in runs if r["error"]],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--invoices-per-year", type=int, default=12)
+    parser.add_argument("--payments", type=int, default=24)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="rezultatele ca JSON")
+    args = parser.parse_args()
+    # erorile injectate apar oricum în coloana de erori; nu mai umplem ieșirea cu avertismente
+    logging.basicConfig(level=logging.ERROR)
+
+    report = {}
+    for n in args.accounts:
+        config = MockConfig(
+            accounts=n,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            invoices_per_year=args.invoices_per_year,
+            payments=args.payments,
+            years=args.years,
+            failure_rate=args.failure_rate,
+        )
+        report[n] = asyncio.run(run_case(config, args.rounds))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(
+        f"{'conturi':>7} {'fază':<12} {'median ms':>10} {'max ms':>10} {'cereri':>7} {'KiB vârf':>9}"
+    )
+    for n, phases in report.items():
+        for phase, s in phases.items():
+            print(
+                f"{n:>7} {phase:<12} {s['median_ms']:>10} {s['max_ms']:>10} "
+                f"{s['requests']:>7} {s['peak_kib']:>9}" + (" !" if s["errors"] else "")
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Server local care imită hosturile Apanova (security-client/bo, client-authorization,
+callistogateway), cu latență, volum de date și erori configurabile.
+
+Clientul ajunge la el printr-o sesiune care rescrie `https://<host>/<cale>` în
+`http://127.0.0.1:<port>/<host>/<cale>` (vezi `RewritingSession`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+SECURITY = ("security-client.apanovabucuresti.ro", "security-bo.apanovabucuresti.ro")
+AUTH = "client-authorization.apanovabucuresti.ro"
+GATEWAY = "callistogateway.apanovabucuresti.ro"
+_ID_SEGMENT = re.compile(r"/\d[\w-]*(?=/|$)")
+
+
+@dataclass
+class MockConfig:
+    accounts: int = 1
+    # latența fiecărui răspuns (ms), plus jitter uniform
+    latency_ms: float = 20.0
+    jitter_ms: float = 5.0
+    # volumul listelor: facturi / plăți pe an, ani de istoric
+    invoices_per_year: int = 12
+    payments: int = 24
+    years: int = 3
+    # fracțiunea de cereri callistogateway care întorc 500
+    failure_rate: float = 0.0
+    # endpoint-urile callistogateway (ex. "apiclientindexhistory") care întorc mereu
+    # failure_status, ca o singură resursă căzută în spatele unei gazde sănătoase
+    failing_endpoints: tuple[str, ...] = ()
+    failure_status: int = 500
+    # forma de login acceptată (celelalte primesc 400)
+    login_shape: str = "userMail"
+    seed: int = 1
+    token_ttl: int = 3600
+
+
+def _jwt(ttl: int) -> str:
+    def part(obj) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+    return f"{part({'alg': 'none'})}.{part({'exp': int(time.time()) + ttl})}.sig"
+
+
+@dataclass
+class MockApanova:
+    config: MockConfig = field(default_factory=MockConfig)
+    requests: Counter = field(default_factory=Counter)
+    bytes_sent: int = 0
+
+    def __post_init__(self) -> None:
+        self._rnd = random.Random(self.config.seed)
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    @property
+    def codes(self) -> list[str]:
+        return [f"{100000 + i:010d}" for i in range(self.config.accounts)]
+
+    def reset(self) -> None:
+        self.requests.clear()
+        self.bytes_sent = 0
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_route("*", "/{host}/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        host = request.match_info["host"]
+        path = "/" + request.match_info["path"]
+        self.requests[f"{host}{_ID_SEGMENT.sub('/{id}', path)}"] += 1
+        cfg = self.config
+        await asyncio.sleep((cfg.latency_ms + self._rnd.uniform(0, cfg.jitter_ms)) / 1000)
+        if host == GATEWAY and self._rnd.random() < cfg.failure_rate:
+            return web.json_response({"error": "injected"}, status=500)
+        if host == GATEWAY and any(f"/{e}" in path for e in cfg.failing_endpoints):
+            return web.json_response({"error": "injected"}, status=cfg.failure_status)
+        status, body = 404, {}
+        if host in SECURITY and path == "/api/Login":
+            status, body = await self._login(request)
+        elif host == AUTH:
+            status, body = self._auth(path)
+        elif host == GATEWAY:
+            status, body = self._gateway(path, request.query)
+        raw = json.dumps(body).encode()
+        self.bytes_sent += len(raw)
+        return web.Response(status=status, body=raw, content_type="application/json")
+
+    async def _login(self, request: web.Request) -> tuple[int, dict]:
+        payload = await request.json()
+        if self.config.login_shape not in payload:
+            return 400, {"message": "bad request"}
+        return 200, {"accessToken": _jwt(self.config.token_ttl), "userId": "u-1"}
+
+    def _auth(self, path: str) -> tuple[int, dict | list]:
+        if path == "/api/User":
+            return 200, {"userId": "u-1"}
+        if path.startswith("/api/User/"):
+            payload = {
+                "email": "bench@example.com",
+                "lastname": "Bench",
+                "firstname": "User",
+                "clientNumber": self.codes[0],
+            }
+            return 200, {"userData": {"Payload": payload}}
+        if path.endswith("/GetCodClientListByToken"):
+            return 200, [{"clientNumber": c} for c in self.codes]
+        return 404, {}
+
+    def _gateway(self, path: str, query) -> tuple[int, dict]:
+        name = path.rstrip("/").split("/")[3] if path.count("/") >= 3 else ""
+        cod = query.get("clientNumber") or path.rsplit("/", 1)[-1]
+        today = date.today()
+        if name == "apiclientconsumptionpoint":
+            info = {
+                "ConsumptionClientAddress": f"Str. Benchmark {cod}",
+                "ConsumptionPointCode": f"L{cod}",
+                "ConsumptionInstallation": f"I{cod}",
+                "ConsumptionMeters": [f"M{cod}"],
+            }
+            return 200, {"content": {"ConsumptionPointInfo": [info]}}
+        if name == "apiclientcontract":
+            return 200, {"content": {"ContractNumber": f"C{cod}", "Installation": f"I{cod}"}}
+        if name == "apiclientpayments":
+            items = [
+                {
+                    "PaymentDate": f"{today.year}-01-{1 + i % 28:02d}",
+                    "Amount": 10 + i,
+                    "Extra": "x" * 64,
+                }
+                for i in range(self.config.payments)
+            ]
+            return 200, {"content": {"Payments": items}}
+        if name == "apiclientunpaidinvoices":
+            return 200, {"content": {"Invoices": [{"DateIn": today.isoformat(), "Sold": "42,10"}]}}
+        if name == "apiclientinvoices":
+            year = int(query.get("dateFrom", str(today.year))[:4])
+            if year <= today.year - self.config.years:
+                return 200, {"content": {"Invoices": []}}
+            items = [
+                {
+                    "InvoiceNumber": f"{cod}-{year}-{i}",
+                    "DateIn": f"{year}-{1 + i % 12:02d}-05",
+                    "Total": f"{50 + i},25",
+                    "Details": "x" * 256,
+                }
+                for i in range(self.config.invoices_per_year)
+            ]
+            return 200, {"content": {"Invoices": items}}
+        if name == "apiclientcheckmeterautoreading":
+            details = {
+                "Sernr": f"M{cod}",
+                "ConsumptionPointIdentifier": f"L{cod}",
+                "LastIndex": "1234",
+                "LastIndexDate": today.isoformat(),
+                "Inperioada": False,
+                "IsSmart": False,
+            }
+            return 200, {"content": {"MeterReadingDetails": [details]}}
+        if name == "apiclientindexhistory":
+            year = int(query.get("year", today.year))
+            if year <= today.year - self.config.years:
+                return 200, {"content": {}}
+            entries = [
+                {
+                    "StartDate": f"{year}-{m:02d}-01",
+                    "EndDate": f"{year}-{m:02d}-28",
+                    "Index": str(year * 100 + m),
+                    "Consumption": str(m),
+                }
+                for m in range(1, 13)
+            ]
+            points = [{"IndexHistoryByMeter": [{"MeterIndexList": entries}]}]
+            return 200, {"content": {"ConsumptionPoints": points}}
+        if name == "apiwater":
+            details = [
+                {"Sector": s, "Clor": 0.2, "PH": 7.4, "Turbiditate": 0.1} for s in range(1, 7)
+            ]
+            return 200, {"content": {"LastUpdateDate": today.isoformat(), "WaterDetails": details}}
+        return 404, {}
+
+
+class RewritingSession:
+    """Sesiune aiohttp care trimite cererile către serverul local în locul hosturilor reale."""
+
+    def __init__(self, base_url: str) -> None:
+        self._base = base_url
+        self._session = aiohttp.ClientSession()
+
+    @property
+    def closed(self) -> bool:
+        return self._session.closed
+
+    def request(self, method: str, url: str, **kwargs):
+        parts = urlsplit(url)
+        local = f"{self._base}/{parts.hostname}{parts.path}"
+        if parts.query:
+            local += f"?{parts.query}"
+        return self._session.request(method, local, **kwargs)
+
+    async def close(self) -> None:
+        await self._session.close()
@@ -1,55 +1,187 @@
 from __future__ import annotations
 
 import logging
-from datetime import timedelta
+from typing import Any
 
+import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
 from homeassistant.helpers import config_validation as cv
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from .api import ApanovaClient
-from .const import DOMAIN, UPDATE_INTERVAL_MINUTES
+from .const import (
+    DOMAIN,
+    EXPORT_DATASETS,
+    EXPORT_FORMATS,
+    HUB_KEY,
+    SERVICE_EXPORT,
+    SERVICE_GET_ROWS,
+)
+from .coordinator import DataCoordinator
+from .export import async_export
+from .history import HistoryStore
+from .hub import ApanovaHub
+from .statistics import StatisticsImporter
+from .storage import AuthStore, ResponseCache
 
 _LOGGER = logging.getLogger(__name__)
 
 # ✅ declară schema pentru integrare „config-entry only”
 CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
+GET_ROWS_SCHEMA = vol.Schema(
+    {
+        vol.Required("entity_id"): cv.entity_ids,
+        vol.Optional("limit"): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    }
+)
+
+EXPORT_SCHEMA = vol.Schema(
+    {
+        vol.Optional("datasets", default=list(EXPORT_DATASETS)): vol.All(
+            cv.ensure_list, [vol.In(EXPORT_DATASETS)]
+        ),
+        vol.Optional("format", default=EXPORT_FORMATS[0]): vol.In(EXPORT_FORMATS),
+        vol.Optional("start"): cv.date,
+        vol.Optional("end"): cv.date,
+        vol.Optional("config_entry_id"): vol.All(cv.ensure_list, [cv.string]),
+    }
+)
+
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
-    # optional: nu mai face nimic pe YAML; doar semnalăm că domeniul există
+    # nimic din YAML; doar serviciile domeniului
+
+    async def _get_rows(call: ServiceCall) -> ServiceResponse:
+        """Rândurile complete ale senzorilor-tabel, la cerere (nu trec prin recorder)."""
+        wanted = set(call.data["entity_id"])
+        limit = call.data.get("limit")
+        result: dict[str, Any] = {}
+        for data in hass.data.get(DOMAIN, {}).values():
+            for entity in data.get("entities", []) if isinstance(data, dict) else []:
+                if entity.entity_id in wanted:
+                    rows = entity.rows()
+                    result[entity.entity_id] = {"rows": rows[:limit], "total": len(rows)}
+        return result
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_ROWS,
+        _get_rows,
+        schema=GET_ROWS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _export(call: ServiceCall) -> ServiceResponse:
+        """Datele normalizate (facturi, plăți, restanțe, indecși, apă) în fișiere sub config."""
+        return await async_export(
+            hass,
+            call.data["datasets"],
+            call.data["format"],
+            start=call.data.get("start"),
+            end=call.data.get("end"),
+            entry_ids=call.data.get("config_entry_id"),
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT,
+        _export,
+        schema=EXPORT_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
-    client = ApanovaClient(hass, entry.data)
-    coordinator = DataCoordinator(hass, client)
-    await coordinator.async_config_entry_first_refresh()
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    hub: ApanovaHub | None = domain_data.get(HUB_KEY)
+    if hub is None:
+        hub = domain_data[HUB_KEY] = ApanovaHub(hass)
+
+    cache = ResponseCache(hass, entry.entry_id)
+    await cache.async_load()
+    auth = AuthStore(hass, entry.entry_id)
+    history = HistoryStore(hass, entry.entry_id)
+    await history.async_load()
+    client = ApanovaClient(
+        hass,
+        entry.data,
+        cache=cache,
+        auth_store=auth,
+        session=hub.session,
+        rate_limiter=hub.acquire,
+        breaker=hub.breaker,
+        history=history,
+    )
+    client.restore_auth(await auth.async_load())
+    coordinator = DataCoordinator(hass, client, stagger=hub.register(entry.entry_id, client))
+    if coordinator.restore_from_cache():
+        # stale-while-revalidate: senzorii pornesc din cache, refresh-ul rulează în fundal
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN}_revalidate_{entry.entry_id}"
+        )
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            if not hub.unregister(entry.entry_id):
+                domain_data.pop(HUB_KEY)
+                await hub.async_close()
+            raise
+    await hub.shared.async_ensure_data()
+
+    # istoricul de index și facturile merg în statisticile pe termen lung (o dată per set nou)
+    importer = StatisticsImporter(hass)
+    imported = [None]
+
+    @callback
+    def _import_statistics() -> None:
+        if not coordinator.data or coordinator.generation == imported[0]:
+            return
+        imported[0] = coordinator.generation
+        entry.async_create_background_task(
+            hass,
+            importer.async_import(coordinator.model),
+            f"{DOMAIN}_statistics_{entry.entry_id}",
+        )
+
+    entry.async_on_unload(coordinator.async_add_listener(_import_statistics))
+    _import_statistics()
+    domain_data[entry.entry_id] = {
         "client": client,
         "coordinator": coordinator,
+        "shared": hub.shared,
     }
+    # modul atributelor (compact / clasic) se aplică la reîncărcare
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
     return True
 
 
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id, None)
+        domain_data = hass.data[DOMAIN]
+        domain_data.pop(entry.entry_id, None)
+        hub: ApanovaHub | None = domain_data.get(HUB_KEY)
+        if hub is not None and not hub.unregister(entry.entry_id):
+            domain_data.pop(HUB_KEY)
+            await hub.async_close()
     return unload_ok
 
 
-class DataCoordinator(DataUpdateCoordinator):
-    def __init__(self, hass: HomeAssistant, client: ApanovaClient):
-        super().__init__(
-            hass,
-            _LOGGER,
-            name="apanova_ro",
-            update_interval=timedelta(minutes=UPDATE_INTERVAL_MINUTES),
-        )
-        self.client = client
-
-    async def _async_update_data(self):
-        return await self.client.refresh_all()
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await ResponseCache(hass, entry.entry_id).async_remove()
+    await AuthStore(hass, entry.entry_id).async_remove()
+    await HistoryStore(hass, entry.entry_id).async_remove()
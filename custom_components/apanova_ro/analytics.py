@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import statistics
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from .const import (
+    ANALYTICS_MIN_PERIODS,
+    ANALYTICS_ROLLING_PERIODS,
+    ANOMALY_ZSCORE,
+    LEAK_FACTOR,
+    LEAK_PERIODS,
+    YOY_TOLERANCE_DAYS,
+)
+from .models import Account, IndexPeriod
+
+try:
+    import numpy as np
+except ImportError:  # NumPy e opțional; fără el se calculează element cu element
+    np = None
+
+
+@dataclass(slots=True, frozen=True)
+class MeterStats:
+    periods: int
+    # consumul zilnic (m³/zi) al ultimei perioade și media ultimelor ANALYTICS_ROLLING_PERIODS
+    last_daily: float | None = None
+    rolling_daily: float | None = None
+    # variația față de perioada corespunzătoare de anul trecut (%)
+    yoy_pct: float | None = None
+    zscore: float | None = None
+    anomaly: bool = False
+    leak: bool = False
+    typical_days: int | None = None
+
+
+def _daily(consumption: list[float], days: list[int]) -> list[float]:
+    if np is not None:
+        return (np.asarray(consumption, float) / np.maximum(np.asarray(days, float), 1)).tolist()
+    return [c / max(d, 1) for c, d in zip(consumption, days, strict=True)]
+
+
+def _sums(values: list[float]) -> tuple[float, float]:
+    """(suma, suma pătratelor) – baza mediei și a abaterii standard incrementale."""
+    if np is not None:
+        arr = np.asarray(values, float)
+        return float(arr.sum()), float((arr * arr).sum())
+    return sum(values), sum(v * v for v in values)
+
+
+class _MeterState:
+    """Perioadele deja procesate ale unui contor; cele noi se adaugă fără recalcul."""
+
+    __slots__ = (
+        "source",
+        "seen",
+        "seen_end",
+        "ends",
+        "days",
+        "consumption",
+        "rates",
+        "last_index",
+        "sum",
+        "sumsq",
+    )
+
+    def __init__(self) -> None:
+        self.source: tuple[IndexPeriod, ...] | None = None
+        # câte perioade din istoric au fost procesate și sfârșitul ultimei
+        self.seen = 0
+        self.seen_end: datetime | None = None
+        self.ends: list[datetime] = []
+        self.days: list[int] = []
+        self.consumption: list[float] = []
+        self.rates: list[float] = []
+        self.last_index: float | None = None
+        self.sum = 0.0
+        self.sumsq = 0.0
+
+    def matches(self, periods: tuple[IndexPeriod, ...]) -> bool:
+        """Perioadele procesate sunt un prefix al celor primite (doar s-au adăugat altele)."""
+        n = self.seen
+        return len(periods) >= n and (n == 0 or periods[n - 1].end == self.seen_end)
+
+    def extend(self, periods: tuple[IndexPeriod, ...]) -> None:
+        if not periods:
+            return
+        previous_end = self.seen_end
+        self.seen += len(periods)
+        self.seen_end = periods[-1].end
+        cons: list[float] = []
+        days: list[int] = []
+        ends: list[datetime] = []
+        for p in periods:
+            if not isinstance(p.index, int | float):
+                continue
+            c = p.consumption
+            if not isinstance(c, int | float):
+                c = max(p.index - self.last_index, 0) if self.last_index is not None else None
+            self.last_index = p.index
+            start = p.start or previous_end
+            previous_end = p.end
+            if c is None or start is None:
+                continue
+            cons.append(float(c))
+            days.append((p.end - start).days)
+            ends.append(p.end)
+        if not cons:
+            return
+        rates = _daily(cons, days)
+        total, squares = _sums(rates)
+        self.ends += ends
+        self.days += days
+        self.consumption += cons
+        self.rates += rates
+        self.sum += total
+        self.sumsq += squares
+
+
+class ConsumptionAnalytics:
+    """Consum zilnic, medii, comparații an/an și semnalări pe istoricul de index.
+
+    Starea se păstrează per contor ("cod|loc|contor"); la fiecare refresh se procesează
+    doar perioadele noi. Dacă istoricul se schimbă altfel (ex. backfill de ani vechi),
+    contorul se recalculează de la zero.
+    """
+
+    def __init__(self) -> None:
+        self._meters: dict[str, _MeterState] = {}
+        self._stats: dict[str, MeterStats] = {}
+
+    def meter(self, key: str, periods: tuple[IndexPeriod, ...]) -> MeterStats:
+        state = self._meters.get(key)
+        if state is not None and state.source is periods:
+            return self._stats[key]
+        if state is None or not state.matches(periods):
+            state = self._meters[key] = _MeterState()
+        state.extend(periods[state.seen :])
+        state.source = periods
+        self._stats[key] = stats = self._evaluate(state)
+        return stats
+
+    @staticmethod
+    def _evaluate(s: _MeterState) -> MeterStats:
+        n = len(s.rates)
+        if not n:
+            return MeterStats(periods=0)
+        last = s.rates[-1]
+        recent = s.rates[-ANALYTICS_ROLLING_PERIODS:]
+        stats: dict[str, Any] = {
+            "periods": n,
+            "last_daily": round(last, 4),
+            "rolling_daily": round(sum(recent) / len(recent), 4),
+            "typical_days": round(statistics.median(s.days[-12:])),
+        }
+        # perioada cea mai apropiată de aceeași dată de anul trecut
+        target = s.ends[-1] - timedelta(days=365)
+        i = bisect_left(s.ends, target)
+        near = [j for j in (i - 1, i) if 0 <= j < n - 1]
+        if near:
+            j = min(near, key=lambda j: abs((s.ends[j] - target).days))
+            if abs((s.ends[j] - target).days) <= YOY_TOLERANCE_DAYS and s.rates[j] > 0:
+                stats["yoy_pct"] = round((last / s.rates[j] - 1) * 100, 1)
+        # ultima perioadă față de distribuția celor anterioare (sume fără ultimul element)
+        if n - 1 >= ANALYTICS_MIN_PERIODS:
+            mean = (s.sum - last) / (n - 1)
+            var = max((s.sumsq - last * last) / (n - 1) - mean * mean, 0.0)
+            if var > 0:
+                z = (last - mean) / var**0.5
+                stats["zscore"] = round(z, 2)
+                stats["anomaly"] = z >= ANOMALY_ZSCORE
+        # scurgere: ultimele LEAK_PERIODS perioade toate peste referința de dinaintea lor
+        base_n = n - LEAK_PERIODS
+        if base_n >= ANALYTICS_MIN_PERIODS:
+            base = (s.sum - sum(s.rates[-LEAK_PERIODS:])) / base_n
+            stats["leak"] = base > 0 and all(
+                r > base * LEAK_FACTOR for r in s.rates[-LEAK_PERIODS:]
+            )
+        return MeterStats(**stats)
+
+    def projection(self, account: Account) -> dict[str, Any] | None:
+        """Factura următoare estimată: consumul mediu recent × tariful (lei/m³) din ultimul an.
+
+        Tariful = totalul facturat în ultimele 12 luni / consumul contoarelor în aceeași fereastră.
+        """
+        if not account.invoices or not account.history:
+            return None
+        window_end = account.invoices[-1].date
+        window_start = window_end - timedelta(days=365)
+        billed = sum(i.amount for i in account.invoices if i.date > window_start)
+        used = 0.0
+        projected = 0.0
+        for key, periods in account.history.items():
+            stats = self.meter(key, periods)
+            s = self._meters[key]
+            used += sum(
+                c
+                for e, c in zip(s.ends, s.consumption, strict=True)
+                if window_start < e <= window_end
+            )
+            if stats.rolling_daily is not None and stats.typical_days:
+                projected += stats.rolling_daily * stats.typical_days
+        if used <= 0 or billed <= 0:
+            return None
+        tariff = billed / used
+        return {
+            "amount": round(projected * tariff, 2),
+            "tariff": round(tariff, 4),
+            "consumption": round(projected, 3),
+            "billed": round(billed, 2),
+            "billed_consumption": round(used, 3),
+        }
@@ -1,16 +1,52 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import hashlib
+import json
 import logging
+import random
 import time
+from collections.abc import Awaitable, Callable, Iterable
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Any
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
 import aiohttp
 import async_timeout
 from homeassistant.core import HomeAssistant
 
-from .const import USER_AGENT
+from .const import (
+    BREAKER_STATUSES,
+    CONDITIONAL_HOSTS,
+    LOGIN_RACE_WIDTH,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_RESPONSE_BYTES,
+    REFRESH_DEADLINE,
+    REQUEST_TIMEOUT,
+    RESPONSE_CHUNK_SIZE,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_STATUSES,
+    TOKEN_FALLBACK_TTL,
+    TOKEN_REFRESH_MARGIN,
+    USER_AGENT,
+    VALIDATOR_PERIOD_PARAMS,
+)
+from .history import KIND_INDEX, KIND_INVOICES, HistoryStore
+from .metrics import ClientMetrics, endpoint_of
+
+try:
+    import orjson
+except ImportError:  # backend JSON opțional (mai rapid); altfel modulul standard
+    orjson = None
+
+if TYPE_CHECKING:
+    from .hub import CircuitBreaker
+    from .storage import AuthStore, ResponseCache
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -32,131 +68,567 @@ def _explain_status(code: int) -> str:
     return m.get(code, f"HTTP {code}")
 
 
+LOGIN_URLS = [
+    "https://security-client.apanovabucuresti.ro/api/Login",
+    "https://security-bo.apanovabucuresti.ro/api/Login",
+]
+
+# formele de payload acceptate (în funcție de versiunea backend-ului)
+LOGIN_SHAPES: dict[str, Callable[[str, str], dict[str, Any]]] = {
+    "userMail": lambda e, p: {"userMail": e, "password": p},
+    "email": lambda e, p: {"email": e, "password": p},
+    "username": lambda e, p: {"username": e, "password": p},
+    "BodyCredentials": lambda e, p: {"BodyCredentials": {"Email": e, "Password": p}},
+}
+
+
+def _jwt_expiry(token: str | None) -> float | None:
+    """Claim-ul `exp` (epoch sec) dintr-un JWT, fără verificarea semnăturii."""
+    try:
+        part = str(token).split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(part + "=" * (-len(part) % 4)))
+        exp = claims.get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+
+# câmpurile folosite de modele / istoric; restul se aruncă imediat după decodare
+INVOICE_FIELDS = frozenset(
+    {"DateIn", "InvoiceDate", "date", "Total", "value", "amount"}
+    | {"InvoiceNumber", "Number", "InvoiceNo"}
+)
+UNPAID_FIELDS = INVOICE_FIELDS | {"Sold"}
+PAYMENT_FIELDS = frozenset(
+    {"PaymentDate", "DateIn", "Date", "date", "Amount", "Total", "Value", "value", "amount"}
+    | {"PaymentNumber", "DocumentNumber", "InvoiceNumber", "Number"}
+)
+
+
+def _loads(body: bytes) -> Any:
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+async def _read_body(resp: aiohttp.ClientResponse, url: str) -> bytes:
+    """Corpul răspunsului, citit pe bucăți, cu limită de MAX_RESPONSE_BYTES."""
+    if (resp.content_length or 0) > MAX_RESPONSE_BYTES:
+        raise ApanovaError(f"Răspuns prea mare la {endpoint_of(url)}: {resp.content_length} octeți")
+    body = bytearray()
+    async for chunk in resp.content.iter_chunked(RESPONSE_CHUNK_SIZE):
+        body += chunk
+        if len(body) > MAX_RESPONSE_BYTES:
+            raise ApanovaError(
+                f"Răspuns prea mare la {endpoint_of(url)}: peste {MAX_RESPONSE_BYTES} octeți"
+            )
+    return bytes(body)
+
+
+def _project(payload: Any, fields: frozenset[str]) -> Any:
+    """Păstrează doar `fields` în elementele listelor din conținutul răspunsului.
+
+    Elementele fără niciunul dintre câmpuri rămân întregi (formă necunoscută).
+    """
+    content = _content(payload)
+    if isinstance(content, dict):
+        for key, items in content.items():
+            if isinstance(items, list):
+                content[key] = [
+                    {k: it[k] for k in fields if k in it} or it if isinstance(it, dict) else it
+                    for it in items
+                ]
+    return payload
+
+
+# termenul-limită (monotonic) al refresh-ului curent; task-urile planului îl moștenesc
+_deadline: ContextVar[float | None] = ContextVar("apanova_refresh_deadline", default=None)
+
+
+def _retry_class(url: str) -> str:
+    return "gateway" if urlsplit(url).hostname in CONDITIONAL_HOSTS else "auth"
+
+
+def _retry_after_seconds(value: str | None) -> float | None:
+    """Retry-After în secunde (acceptă atât secunde, cât și o dată HTTP)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int, retry_after: str | None = None) -> float:
+    """Pauza după încercarea `attempt` (de la 1): Retry-After, altfel exponențial cu jitter."""
+    seconds = _retry_after_seconds(retry_after)
+    if seconds is not None:
+        return seconds
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+def _can_wait(delay: float) -> bool:
+    """O reîncercare după `delay` sec încape în limita de pauză și în bugetul refresh-ului."""
+    deadline = _deadline.get()
+    return delay <= RETRY_MAX_DELAY and (deadline is None or time.monotonic() + delay < deadline)
+
+
+def _request_timeout() -> float:
+    deadline = _deadline.get()
+    if deadline is None:
+        return REQUEST_TIMEOUT
+    return max(0.0, min(REQUEST_TIMEOUT, deadline - time.monotonic()))
+
+
+def _validator_key(url: str) -> str:
+    """Slotul validatorilor unui URL: endpoint + cod / contor, fără perioada cerută.
+
+    Cererile delta și anii de backfill înlocuiesc intrarea slotului în loc să se adune.
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VALIDATOR_PERIOD_PARAMS)
+    return f"{parts.path}?{urlencode(query)}"
+
+
 def _content(o: Any) -> Any:
     if isinstance(o, dict) and "content" in o and o["content"] not in (None, {}):
         return o["content"]
     return o
 
 
+def _parse_cod_list(data: Any) -> list[str]:
+    """Codurile client din răspunsul GetCodClientListByToken (listă sau obiect împachetat)."""
+    items = data
+    if isinstance(items, dict):
+        for k in ("codes", "list", "items", "data", "result", "value", "ClientNumber"):
+            if k in items and items[k]:
+                items = items[k]
+                break
+    if not isinstance(items, list):
+        items = [items]
+    codes = []
+    for val in items:
+        if isinstance(val, dict):
+            val = (
+                val.get("cod")
+                or val.get("code")
+                or val.get("clientNumber")
+                or val.get("ClientNumber")
+                or val.get("id")
+                or val.get("value")
+            )
+        if val:
+            codes.append(str(val).lstrip("0"))
+    return codes
+
+
 class ApanovaClient:
-    def __init__(self, hass: HomeAssistant, cfg: dict[str, Any]):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        cfg: dict[str, Any],
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        cache: ResponseCache | None = None,
+        auth_store: AuthStore | None = None,
+        session: aiohttp.ClientSession | None = None,
+        rate_limiter: Callable[[str], Awaitable[None]] | None = None,
+        history: HistoryStore | None = None,
+        breaker: Callable[[str], CircuitBreaker] | None = None,
+    ):
         self._hass = hass
+        # siguranța (circuit breaker) gazdei unui URL; None = fără
+        self._breaker = breaker
+        self._history = history
+        self._cache = cache
+        self._auth_store = auth_store
         self._email = cfg.get("email")
         self._password = cfg.get("password")
         self._token: str | None = None
         self._user_id: str | None = None
-        self._session: aiohttp.ClientSession | None = None
+        # sesiunea primită (hub) nu e închisă de client; altfel își creează una proprie
+        self._session: aiohttp.ClientSession | None = session
+        self._owns_session = session is None
+        self._rate_limiter = rate_limiter
         self._login_payload: dict[str, Any] = {}
         self._cached_user_details: dict[str, Any] = {}
 
         # >>> FIX: protecție pentru logări concurente + momentul ultimei autentificări
         self._login_lock: asyncio.Lock = asyncio.Lock()
         self._last_login_ts: float = 0.0  # epoch sec; 0 => nelogat
+        self._token_exp: float | None = None  # din claim-ul `exp`, dacă tokenul e JWT
+        self._login_variant: tuple[str, str] | None = None  # (url, formă payload) reușită
+        # statistici per variantă "url|formă": ok / fail / latență medie (ms) / ultimul succes
+        self._login_stats: dict[str, dict[str, float]] = {}
+
+        # câte cereri HTTP pot rula simultan
+        self._max_concurrency = max(1, int(max_concurrency))
+        # erorile și timpii ultimului refresh (în afara datelor, ca să nu le „schimbe”)
+        self.last_errors: dict[str, str] = {}
+        self.last_timings: dict[str, Any] = {"total": 0.0, "endpoints": {}}
+
+        self._partial_errors: dict[str, str] = {}
+        # limita globală de cereri HTTP simultane ale clientului
+        self._request_sem = asyncio.Semaphore(self._max_concurrency)
+
+        # validatori HTTP pe slot (vezi _validator_key): URL, etag / last_modified / hash corp
+        # și payload decodat; un slot per endpoint și cod, deci memoria rămâne mărginită
+        self._validators: dict[str, dict[str, Any]] = {}
+        # GET-uri în zbor: (url, auth, proiecție) -> task comun al apelanților simultani
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        # latență / octeți / status per endpoint, contoare și durata refresh-urilor
+        self.metrics = ClientMetrics()
 
     async def _session_get(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                headers={
-                    "User-Agent": USER_AGENT,
-                    "Accept": "application/json",
-                }
-            )
+        if self._owns_session and (self._session is None or self._session.closed):
+            self._session = aiohttp.ClientSession()
         return self._session
 
     async def close(self):
-        if self._session and not self._session.closed:
+        if self._owns_session and self._session and not self._session.closed:
             await self._session.close()
 
     async def _fetch(
-        self, method: str, url: str, data: dict | None = None, use_auth: bool = True
+        self,
+        method: str,
+        url: str,
+        data: dict | None = None,
+        use_auth: bool = True,
+        fields: frozenset[str] | None = None,
+    ) -> dict:
+        """Cerere HTTP; GET-urile identice simultane împart aceeași cerere și același rezultat."""
+        if method != "GET":
+            return await self._fetch_once(method, url, data, use_auth, fields)
+        key = (url, use_auth, fields)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_once(method, url, data, use_auth, fields))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget_inflight(key, t))
+        else:
+            self.metrics.count("coalesced")
+        # anularea unui apelant nu anulează cererea celorlalți
+        return await asyncio.shield(task)
+
+    def _forget_inflight(self, key: tuple, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # consumată aici dacă toți apelanții au fost anulați
+
+    async def _fetch_once(
+        self,
+        method: str,
+        url: str,
+        data: dict | None,
+        use_auth: bool,
+        fields: frozenset[str] | None,
     ) -> dict:
         s = await self._session_get()
-        headers = {}
+        headers = {"User-Agent": USER_AGENT, "Accept": "application/json"}
         if data is not None:
             headers["Content-Type"] = "application/json; charset=utf-8"
         if use_auth and self._token:
             headers["x-auth-token"] = self._token
 
+        conditional = method == "GET" and urlsplit(url).hostname in CONDITIONAL_HOSTS
+        # doar GET-urile (idempotente) se reîncearcă; login-ul (POST) niciodată
+        attempts = RETRY_ATTEMPTS.get(_retry_class(url), 1) if method == "GET" else 1
+        retry_after: str | None = None
+        # ultimul timeout a fost scurtat de bugetul refresh-ului (nu spune nimic despre gazdă)
+        budget_cut = False
+
         async def _do():
-            async with async_timeout.timeout(30):
+            nonlocal budget_cut
+            cached = self._validators.get(_validator_key(url)) if conditional else None
+            if cached and cached["url"] != url:
+                cached = None
+            if cached:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+            async with self._request_sem:
+                if self._rate_limiter is not None:
+                    await self._rate_limiter(url)
+                timeout = _request_timeout()
+                if timeout <= 0:
+                    self.metrics.count("deadline_exceeded")
+                    raise ApanovaError(
+                        f"Bugetul refresh-ului epuizat înainte de {endpoint_of(url)}"
+                    )
+                budget_cut = timeout < REQUEST_TIMEOUT
+                return await _request(cached, timeout)
+
+        async def _request(cached, timeout: float):
+            start = time.monotonic()
+            try:
+                return await _exchange(cached, start, timeout)
+            except (TimeoutError, aiohttp.ClientError, ApanovaError):
+                self.metrics.record(url, 0, time.monotonic() - start)
+                raise
+
+        async def _exchange(cached, start, timeout: float):
+            nonlocal retry_after
+            async with async_timeout.timeout(timeout):
                 async with s.request(method, url, json=data, headers=headers) as resp:
                     code = resp.status
+                    retry_after = resp.headers.get("Retry-After")
+                    if code == 304 and cached:
+                        self.metrics.record(url, code, time.monotonic() - start)
+                        self.metrics.count("not_modified")
+                        return 200, cached["payload"]
+                    body = await _read_body(resp, url)
+                    self.metrics.record(url, code, time.monotonic() - start, len(body))
+                    digest = hashlib.sha1(body).hexdigest() if conditional else None
+                    if cached and code == 200 and digest == cached.get("hash"):
+                        # server fără validatori (sau care îi ignoră): același corp, același obiect
+                        return code, cached["payload"]
                     try:
-                        payload = await resp.json(content_type=None)
-                    except Exception:
+                        payload = _loads(body) if body else {}
+                    except ValueError:
                         payload = {}
+                    del body
+                    if fields is not None and code == 200:
+                        payload = _project(payload, fields)
+                    if conditional and code == 200:
+                        self._validators[_validator_key(url)] = {
+                            "url": url,
+                            "etag": resp.headers.get("ETag"),
+                            "last_modified": resp.headers.get("Last-Modified"),
+                            "hash": digest,
+                            "payload": payload,
+                        }
                     return code, payload
 
+        async def _with_retry():
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    result = await _do()
+                except (TimeoutError, aiohttp.ClientError):
+                    if attempt >= attempts or not _can_wait(delay := _backoff(attempt)):
+                        raise
+                else:
+                    code = result[0]
+                    if code not in RETRY_STATUSES or attempt >= attempts:
+                        return result
+                    delay = _backoff(attempt, retry_after if code in (429, 503) else None)
+                    if not _can_wait(delay):
+                        return result
+                self.metrics.count("retry")
+                _LOGGER.debug(
+                    "Reîncercare %s peste %.1fs (încercarea %d)",
+                    endpoint_of(url),
+                    delay,
+                    attempt + 1,
+                )
+                await asyncio.sleep(delay)
+
+        async def _guarded():
+            """O cerere logică: siguranța gazdei o lasă să plece și primește un singur
+            rezultat, după toate reîncercările."""
+            circuit = self._breaker(url) if self._breaker is not None else None
+            if circuit is None:
+                return await _with_retry()
+            if not circuit.allow():
+                self.metrics.count("circuit_open")
+                raise ApanovaError(
+                    f"{urlsplit(url).hostname} indisponibil (circuit deschis, "
+                    f"probă peste {circuit.retry_in:.0f}s)"
+                )
+            try:
+                code, payload = await _with_retry()
+            except TimeoutError:
+                if budget_cut:
+                    circuit.abort()
+                else:
+                    circuit.record(False)
+                raise
+            except aiohttp.ClientError:
+                circuit.record(False)
+                raise
+            except BaseException:
+                # anulare / buget epuizat / răspuns respins local: nu spune nimic despre gazdă
+                circuit.abort()
+                raise
+            # gazda a răspuns; un 500 al unui singur endpoint nu o face indisponibilă
+            circuit.record(code not in BREAKER_STATUSES)
+            return code, payload
+
         try:
-            code, payload = await _do()
+            code, payload = await _guarded()
             if code == 401 and use_auth:
                 # token expirat – relogin și retry o dată
-                await self.login()
+                self.metrics.count("relogin")
+                await self._relogin(headers.get("x-auth-token"))
                 headers["x-auth-token"] = self._token or ""
-                code, payload = await _do()
+                code, payload = await _guarded()
             if code >= 400:
                 raise ApanovaError(
-                    f"Eroare API {url} → {_explain_status(code)} // payload keys: {list(payload.keys())}"
+                    f"Eroare API {endpoint_of(url)} → {_explain_status(code)} // payload keys: {list(payload.keys())}"
                 )
             return payload
         except TimeoutError as e:
-            raise ApanovaError(f"Timeout la apelul {url}") from e
+            raise ApanovaError(f"Timeout la apelul {endpoint_of(url)}") from e
         except aiohttp.ClientError as e:
-            raise ApanovaError(f"Eroare de rețea la apelul {url}: {e}") from e
+            # mesajul aiohttp poate conține URL-ul complet (cu token / coduri în query)
+            raise ApanovaError(
+                f"Eroare de rețea la apelul {endpoint_of(url)}: {type(e).__name__}"
+            ) from e
+
+    def restore_auth(self, saved: dict[str, Any]) -> None:
+        """Reia tokenul și varianta de login salvate la rularea anterioară."""
+        variant = saved.get("variant")
+        if isinstance(variant, list | tuple) and len(variant) == 2:
+            self._login_variant = (str(variant[0]), str(variant[1]))
+        if isinstance(saved.get("login_stats"), dict):
+            self._login_stats = saved["login_stats"]
+        token = saved.get("token")
+        if not token or saved.get("email") != self._email:
+            return
+        self._token = token
+        self._user_id = saved.get("user_id")
+        self._last_login_ts = float(saved.get("login_ts") or 0)
+        self._token_exp = _jwt_expiry(token)
+
+    def _save_auth(self) -> None:
+        if self._auth_store is None:
+            return
+        self._auth_store.save(
+            {
+                "email": self._email,
+                "token": self._token,
+                "user_id": self._user_id,
+                "login_ts": self._last_login_ts,
+                "variant": list(self._login_variant) if self._login_variant else None,
+                "login_stats": self._login_stats,
+            }
+        )
+
+    @property
+    def login_stats(self) -> dict[str, dict[str, float]]:
+        return self._login_stats
+
+    @property
+    def login_variant(self) -> list[str] | None:
+        return list(self._login_variant) if self._login_variant else None
+
+    def _record_login(self, u: str, shape: str, ok: bool, elapsed: float) -> None:
+        st = self._login_stats.setdefault(
+            f"{u}|{shape}", {"ok": 0, "fail": 0, "avg_ms": 0.0, "last_ok": 0.0}
+        )
+        st["ok" if ok else "fail"] += 1
+        n = st["ok"] + st["fail"]
+        st["avg_ms"] = round(st["avg_ms"] + (elapsed * 1000 - st["avg_ms"]) / n, 1)
+        if ok:
+            st["last_ok"] = time.time()
+
+    def _login_candidates(self) -> list[tuple[str, str]]:
+        """Variantele de login: cea fixată prima, apoi după rata de succes și latență."""
+        order = [(u, shape) for u in LOGIN_URLS for shape in LOGIN_SHAPES]
+
+        def rank(v: tuple[str, str]):
+            st = self._login_stats.get(f"{v[0]}|{v[1]}") or {}
+            ok, fail = st.get("ok", 0), st.get("fail", 0)
+            # estimare Laplace: variantele neîncercate pornesc de la 0.5
+            return (v != self._login_variant, -(ok + 1) / (ok + fail + 2), st.get("avg_ms", 0.0))
+
+        return sorted(order, key=lambda v: (rank(v), order.index(v)))
+
+    async def _try_login(self, u: str, shape: str) -> dict[str, Any]:
+        """Un singur POST de login; întoarce payload-ul doar dacă are token."""
+        start = time.monotonic()
+        try:
+            data = await self._fetch(
+                "POST", u, LOGIN_SHAPES[shape](self._email, self._password), use_auth=False
+            )
+        except ApanovaError:
+            self._record_login(u, shape, False, time.monotonic() - start)
+            raise
+        ok = bool(data.get("accessToken") or data.get("token") or data.get("access_token"))
+        self._record_login(u, shape, ok, time.monotonic() - start)
+        if not ok:
+            raise ApanovaError(f"Răspuns fără token de la {u} ({shape})")
+        return data
+
+    async def _race_login(self, batch: list[tuple[str, str]]) -> tuple[tuple[str, str], dict]:
+        """Rulează variantele concurent; prima care întoarce token câștigă, restul sunt anulate."""
+        tasks = {asyncio.create_task(self._try_login(u, shape)): (u, shape) for u, shape in batch}
+        last_error: BaseException | None = None
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        return tasks[t], t.result()
+                    last_error = t.exception()
+        finally:
+            # erorile perdanților terminați se preiau, ca asyncio să nu le raporteze ca ignorate
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+                elif not t.cancelled():
+                    t.exception()
+        raise ApanovaError(str(last_error))
 
     async def login(self) -> None:
-        urls = [
-            "https://security-client.apanovabucuresti.ro/api/Login",
-            "https://security-bo.apanovabucuresti.ro/api/Login",
-        ]
-        payloads = [
-            {"userMail": self._email, "password": self._password},
-            {"email": self._email, "password": self._password},
-            {"username": self._email, "password": self._password},
-            {"BodyCredentials": {"Email": self._email, "Password": self._password}},
-        ]
+        candidates = self._login_candidates()
+        # varianta fixată merge singură (cazul uzual: un singur POST); restul în loturi concurente
+        batches = [candidates[:1]] if self._login_variant else []
+        rest = candidates[len(batches) :]
+        batches += [rest[i : i + LOGIN_RACE_WIDTH] for i in range(0, len(rest), LOGIN_RACE_WIDTH)]
         last_error: Exception | None = None
-        for u in urls:
-            for p in payloads:
-                try:
-                    data = await self._fetch("POST", u, p, use_auth=False)
-                    token = data.get("accessToken") or data.get("token") or data.get("access_token")
-                    user_id = (
-                        data.get("userId")
-                        or data.get("UserId")
-                        or (data.get("userData") or {}).get("UserId")
-                    )
-                    if token:
-                        self._token = token
-                        self._user_id = user_id
-                        self._login_payload = data
-                        self._last_login_ts = time.time()  # <<< setăm momentul autentificării
-                        return
-
-                except Exception as e:
-                    last_error = e
+        for batch in batches:
+            try:
+                (u, shape), data = await self._race_login(batch)
+            except Exception as e:
+                last_error = e
+                continue
+            self._token = data.get("accessToken") or data.get("token") or data.get("access_token")
+            self._user_id = (
+                data.get("userId")
+                or data.get("UserId")
+                or (data.get("userData") or {}).get("UserId")
+            )
+            self._login_payload = data
+            self._last_login_ts = time.time()  # <<< setăm momentul autentificării
+            self._token_exp = _jwt_expiry(self._token)
+            self._login_variant = (u, shape)
+            self._save_auth()
+            return
+        self._save_auth()
         raise ApanovaError(f"Nu s-a putut obține token. Ultima eroare: {last_error}")
 
+    def _token_valid(self) -> bool:
+        """Tokenul e valid până la `exp` minus o marjă; fără `exp`, TOKEN_FALLBACK_TTL de la login."""
+        if not self._token or not self._last_login_ts:
+            return False
+        now = time.time()
+        if self._token_exp:
+            return now < self._token_exp - TOKEN_REFRESH_MARGIN
+        return now - self._last_login_ts < TOKEN_FALLBACK_TTL
+
     async def _ensure_login(self):
-        """Login dacă lipsesc credențialele sau dacă au trecut >6h de la ultima autentificare."""
-        need_login = (
-            not self._token
-            or not self._last_login_ts
-            or (time.time() - self._last_login_ts) > 6 * 3600
-        )
-        if not need_login:
+        """Login dacă lipsește tokenul sau dacă expiră în curând."""
+        if self._token_valid():
             return
 
         async with self._login_lock:
             # verificare din nou în lock (altă corutină poate să fi logat între timp)
-            need_login = (
-                not self._token
-                or not self._last_login_ts
-                or (time.time() - self._last_login_ts) > 6 * 3600
-            )
-            if need_login:
+            if not self._token_valid():
                 await self.login()
 
+    async def _relogin(self, stale_token: str | None) -> None:
+        """Relogin după 401; apelurile concurente care au primit 401 pe același token fac un singur login."""
+        async with self._login_lock:
+            if self._token and self._token != stale_token:
+                return
+            await self.login()
+
     async def get_user_details(self) -> dict:
         await self._ensure_login()
         if not self._user_id:
@@ -177,43 +649,27 @@ class ApanovaClient:
         self._cached_user_details = details or {}
         return details
 
-    async def get_cod_client(self) -> str:
+    async def get_cod_clients(self) -> list[str]:
+        """Toate codurile client asociate loginului; cel din profilul utilizatorului e primul."""
+        codes: list[str] = []
         payload = (
             (self._cached_user_details.get("userData") or {}).get("Payload")
             if self._cached_user_details
             else {}
         )
-        if isinstance(payload, dict):
-            cod = payload.get("clientNumber")
-            if cod:
-                return str(cod).lstrip("0")
+        if isinstance(payload, dict) and payload.get("clientNumber"):
+            codes.append(str(payload["clientNumber"]).lstrip("0"))
         await self._ensure_login()
         url = f"https://client-authorization.apanovabucuresti.ro/api/ClientAuthorization/GetCodClientListByToken?token={self._token}"
-        data = await self._fetch("GET", url)
-        val = data
-        if isinstance(val, list) and val:
-            val = val[0]
-        elif isinstance(val, dict):
-            for k in ("codes", "list", "items", "data", "result", "value", "ClientNumber"):
-                if k in val and val[k]:
-                    val = val[k]
-                    if isinstance(val, list) and val:
-                        val = val[0]
-                    break
-        if isinstance(val, dict):
-            cod = (
-                val.get("cod")
-                or val.get("code")
-                or val.get("clientNumber")
-                or val.get("ClientNumber")
-                or val.get("id")
-                or val.get("value")
-            )
-        else:
-            cod = val
-        if not cod:
+        try:
+            codes += _parse_cod_list(await self._fetch("GET", url))
+        except ApanovaError:
+            if not codes:
+                raise
+        codes = list(dict.fromkeys(c for c in codes if c))
+        if not codes:
             raise ApanovaError("Nu am putut determina codul client.")
-        return str(cod).lstrip("0")
+        return codes
 
     async def get_consumption_points(self, cod: str) -> dict:
         await self._ensure_login()
@@ -231,7 +687,9 @@ class ApanovaClient:
     async def get_payments(self, cod: str) -> dict:
         await self._ensure_login()
         return await self._fetch(
-            "GET", f"https://callistogateway.apanovabucuresti.ro/api/v2/apiclientpayments/{cod}"
+            "GET",
+            f"https://callistogateway.apanovabucuresti.ro/api/v2/apiclientpayments/{cod}",
+            fields=PAYMENT_FIELDS,
         )
 
     async def get_unpaid(self, cod: str) -> dict:
@@ -239,15 +697,20 @@ class ApanovaClient:
         return await self._fetch(
             "GET",
             f"https://callistogateway.apanovabucuresti.ro/api/v2/apiclientunpaidinvoices?clientNumber={cod}",
+            fields=UNPAID_FIELDS,
         )
 
-    async def get_invoices_year(self, cod: str, year: int) -> dict:
+    async def get_invoices_range(self, cod: str, date_from: str, date_to: str) -> dict:
         await self._ensure_login()
         return await self._fetch(
             "GET",
-            f"https://callistogateway.apanovabucuresti.ro/api/v2/apiclientinvoices?clientNumber={cod}&dateFrom={year}-01-01&dateTo={year}-12-31",
+            f"https://callistogateway.apanovabucuresti.ro/api/v2/apiclientinvoices?clientNumber={cod}&dateFrom={date_from}&dateTo={date_to}",
+            fields=INVOICE_FIELDS,
         )
 
+    async def get_invoices_year(self, cod: str, year: int) -> dict:
+        return await self.get_invoices_range(cod, f"{year}-01-01", f"{year}-12-31")
+
     async def get_check_window(self, cod: str) -> dict:
         await self._ensure_login()
         return await self._fetch(
@@ -265,64 +728,275 @@ class ApanovaClient:
         url = "https://callistogateway.apanovabucuresti.ro/api/v2/apiwater/quality"
         return await self._fetch("GET", url)
 
-    def _first(self, xs):
-        if isinstance(xs, list) and xs:
-            return xs[0]
-        return xs
-
-    def _extract_contor_loc(self, consumption: dict, check: dict):
-        contor = None
-        loc = None
+    def _extract_meters(self, consumption: dict, check: dict) -> list[list[str]]:
+        """Toate perechile [loc consum, contor] ale unui cod client."""
+        meters: list[list[str]] = []
         c = _content(consumption)
         if isinstance(c, dict):
-            info = self._first(c.get("ConsumptionPointInfo") or [])
-            if isinstance(info, dict):
-                cm = info.get("ConsumptionMeters") or []
-                if cm:
-                    contor = str(self._first(cm))
-                if not loc:
-                    loc = str(info.get("ConsumptionPointCode") or "")
+            for info in c.get("ConsumptionPointInfo") or []:
+                if not isinstance(info, dict):
+                    continue
+                loc = str(info.get("ConsumptionPointCode") or "")
+                for contor in info.get("ConsumptionMeters") or []:
+                    meters.append([loc, str(contor)])
         ch = _content(check)
         if isinstance(ch, dict):
-            details = self._first(ch.get("MeterReadingDetails") or [])
-            if isinstance(details, dict):
-                contor = contor or str(details.get("Sernr") or "")
-                loc = loc or str(details.get("ConsumptionPointIdentifier") or "")
-        return contor, loc
+            known = {m[1] for m in meters}
+            for details in ch.get("MeterReadingDetails") or []:
+                if not isinstance(details, dict):
+                    continue
+                contor = str(details.get("Sernr") or "")
+                loc = str(details.get("ConsumptionPointIdentifier") or "")
+                if contor and contor not in known:
+                    meters.append([loc, contor])
+                    known.add(contor)
+        return [m for m in meters if m[0] and m[1]]
+
+    async def _per_code(
+        self, name: str, r: dict[str, Any], call: Callable[[str], Awaitable[Any]]
+    ) -> dict[str, Any]:
+        """Apelează `call` pentru fiecare cod client; un cod eșuat își păstrează valoarea veche."""
+        codes = r["codes"]
+        previous = r.get(name) or {}
+        results = await asyncio.gather(*(call(cod) for cod in codes), return_exceptions=True)
+        out: dict[str, Any] = {}
+        failures = 0
+        for cod, res in zip(codes, results, strict=True):
+            if isinstance(res, BaseException):
+                if not isinstance(res, Exception):
+                    raise res
+                failures += 1
+                self._partial_errors[f"{name}/{cod}"] = str(res)
+                _LOGGER.warning("Apanova: '%s' pentru codul %s a eșuat: %s", name, cod, res)
+                out[cod] = previous.get(cod) or {}
+            else:
+                out[cod] = res or {}
+        if codes and failures == len(codes):
+            raise ApanovaError(self._partial_errors[f"{name}/{codes[-1]}"])
+        return out
+
+    def _meters_of(self, r: dict[str, Any]) -> dict[str, list[list[str]]]:
+        """Contoarele fiecărui cod client, din datele de consum și fereastra de citire."""
+        return {
+            cod: self._extract_meters(
+                (r.get("consumption") or {}).get(cod) or {}, (r.get("check") or {}).get(cod) or {}
+            )
+            for cod in r.get("codes") or []
+        }
 
-    async def refresh_all(self) -> dict:
-        await self._ensure_login()
-        user_details = await self.get_user_details()
-        cod = await self.get_cod_client()
-        consumption = await self.get_consumption_points(cod)
-        contract = await self.get_contract(cod)
-        payments = await self.get_payments(cod)
-        unpaid = await self.get_unpaid(cod)
-        invoices = await self.get_invoices_year(cod, datetime.now().year)
-        check = await self.get_check_window(cod)
-        water = await self.get_water_quality()
-
-        contor, loc = self._extract_contor_loc(consumption, check)
-
-        index_history = {}
+    async def _load_index_history(self, r: dict[str, Any]) -> dict[str, Any]:
+        meters = self._meters_of(r)
+        keys = [f"{cod}|{loc}|{contor}" for cod, ms in meters.items() for loc, contor in ms]
+        if not keys:
+            return {}
+        return await self._per_code("index_history", {**r, "codes": keys}, self._load_index)
+
+    async def _backfill(self, kind: str, key: str, fetch: Callable[[int], Awaitable[list]]) -> None:
+        """Descarcă cel mult un an încheiat lipsă din istoric (un request pe ciclu)."""
+        h = self._history
+        year = datetime.now().year
+        back = h.next_backfill_year(kind, key, year)
+        if back is None:
+            return
         try:
-            if contor and loc:
-                index_history = await self.get_index_history(cod, loc, contor, datetime.now().year)
-        except Exception as e:
-            _LOGGER.debug("Index history load failed: %s", e)
+            items = await fetch(back)
+        except ApanovaError as e:
+            _LOGGER.debug("Backfill %s %s/%s eșuat: %s", kind, key, back, e)
+            return
+        if items or h.has_year(kind, key, back):
+            h.merge(kind, key, back, items, closed=True)
+        else:
+            h.mark_exhausted(kind, key)
+
+    async def _load_invoices(self, cod: str) -> dict:
+        """Facturile unui cod: anul curent incremental + istoricul local (dacă există)."""
+        year = datetime.now().year
+        if self._history is None:
+            return await self.get_invoices_year(cod, year)
+
+        def _items(payload) -> list:
+            c = _content(payload or {})
+            return (c.get("Invoices") or []) if isinstance(c, dict) else []
+
+        h = self._history
+        since = h.last_date(KIND_INVOICES, cod, year) or f"{year}-01-01"
+        fresh = await self.get_invoices_range(cod, since, f"{year}-12-31")
+        h.merge(KIND_INVOICES, cod, year, _items(fresh))
+        await self._backfill(
+            KIND_INVOICES,
+            cod,
+            lambda y: self._fetch_items(self.get_invoices_year(cod, y), _items),
+        )
+        return {"Invoices": h.items(KIND_INVOICES, cod)}
+
+    async def _load_index(self, key: str) -> dict:
+        """Istoricul de index al unui contor ("cod|loc|contor"), cu aceeași strategie."""
+        cod, loc, contor = key.split("|")
+        year = datetime.now().year
+        if self._history is None:
+            return await self.get_index_history(cod, loc, contor, year)
+
+        def _items(payload) -> list:
+            c = _content(payload or {})
+            try:
+                by_meter = c["ConsumptionPoints"][0]["IndexHistoryByMeter"]
+                return by_meter[0].get("MeterIndexList") or []
+            except (KeyError, IndexError, TypeError, AttributeError):
+                return []
+
+        h = self._history
+        fresh = await self.get_index_history(cod, loc, contor, year)
+        h.merge(KIND_INDEX, key, year, _items(fresh))
+        await self._backfill(
+            KIND_INDEX,
+            key,
+            lambda y: self._fetch_items(self.get_index_history(cod, loc, contor, y), _items),
+        )
+        return {
+            "ConsumptionPoints": [
+                {"IndexHistoryByMeter": [{"MeterIndexList": h.items(KIND_INDEX, key)}]}
+            ]
+        }
+
+    @staticmethod
+    async def _fetch_items(request: Awaitable[dict], extract: Callable[[Any], list]) -> list:
+        return extract(await request)
+
+    def _plan(self) -> dict[str, tuple[tuple[str, ...], Callable[[dict], Awaitable[Any]]]]:
+        """Planul unui refresh: set de date -> (dependențe, apel).
+
+        Seturile per cont sunt dicționare cod client -> payload (index_history:
+        "cod|loc|contor" -> payload). O dependență prefixată cu "~" doar ordonează
+        apelul (îi așteaptă rezultatul dacă există), fără ca eșecul ei să-l anuleze.
+        """
+
+        def per_code(name: str, call: Callable[[str], Awaitable[Any]]):
+            return (("codes",), lambda r: self._per_code(name, r, call))
 
         return {
-            "cod": str(cod),
-            "login_payload": self._login_payload,
-            "user_details": user_details or {},
-            "consumption": consumption or {},
-            "contract": contract or {},
-            "payments": payments or {},
-            "unpaid": unpaid or {},
-            "invoices": invoices or {},
-            "check": check or {},
-            "contor": contor,
-            "loc": loc,
-            "index_history": index_history or {},
-            "water": water or {},
+            "user_details": ((), lambda r: self.get_user_details()),
+            "codes": (("~user_details",), lambda r: self.get_cod_clients()),
+            "consumption": per_code("consumption", self.get_consumption_points),
+            "contract": per_code("contract", self.get_contract),
+            "payments": per_code("payments", self.get_payments),
+            "unpaid": per_code("unpaid", self.get_unpaid),
+            "invoices": per_code("invoices", self._load_invoices),
+            "check": per_code("check", self.get_check_window),
+            "index_history": (("codes", "consumption", "check"), self._load_index_history),
         }
+
+    async def _run_plan(
+        self,
+        plan: dict[str, tuple[tuple[str, ...], Callable[[dict], Awaitable[Any]]]],
+        seed: dict[str, Any] | None = None,
+    ) -> tuple[dict[str, Any], dict[str, str], dict[str, float]]:
+        """Rulează planul concurent, respectând dependențele.
+
+        Concurența e limitată la nivel de cerere HTTP (vezi `_fetch`). Dependențele
+        care nu fac parte din plan sunt citite din `seed`. Eșecul unui apel nu
+        oprește restul; doar dependenții lui sunt săriți.
+        """
+        results: dict[str, Any] = dict(seed or {})
+        errors: dict[str, str] = {}
+        timings: dict[str, float] = {}
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def _run(name: str, deps: tuple[str, ...], call) -> None:
+            waits = [tasks[d.lstrip("~")] for d in deps if d.lstrip("~") in tasks]
+            if waits:
+                await asyncio.gather(*waits)
+            failed = [d for d in deps if d in errors]
+            if failed:
+                errors[name] = f"dependență eșuată: {', '.join(failed)}"
+                return
+            start = time.monotonic()
+            try:
+                results[name] = await call(results)
+            except Exception as e:
+                errors[name] = str(e)
+                _LOGGER.warning("Apanova: încărcarea '%s' a eșuat: %s", name, e)
+            finally:
+                timings[name] = round(time.monotonic() - start, 3)
+
+        for name, (deps, call) in plan.items():
+            tasks[name] = asyncio.create_task(_run(name, deps, call))
+        await asyncio.gather(*tasks.values())
+        return results, errors, timings
+
+    async def refresh(
+        self, datasets: Iterable[str] | None = None, previous: dict[str, Any] | None = None
+    ) -> dict:
+        """Reîncarcă doar seturile de date cerute și le combină peste `previous`.
+
+        Dependențele care lipsesc din `previous` sunt aduse automat. Toate cererile
+        (inclusiv reîncercările) au împreună cel mult REFRESH_DEADLINE secunde.
+        """
+        token = _deadline.set(time.monotonic() + REFRESH_DEADLINE)
+        try:
+            return await self._refresh(datasets, previous)
+        finally:
+            _deadline.reset(token)
+
+    async def _refresh(
+        self, datasets: Iterable[str] | None, previous: dict[str, Any] | None
+    ) -> dict:
+        started = time.monotonic()
+        previous = previous or {}
+        plan = self._plan()
+        wanted = set(plan) if datasets is None else {d for d in datasets if d in plan}
+        pending = list(wanted)
+        while pending:
+            for dep in plan[pending.pop()][0]:
+                dep = dep.lstrip("~")
+                if dep not in wanted and not previous.get(dep):
+                    wanted.add(dep)
+                    pending.append(dep)
+        plan = {k: v for k, v in plan.items() if k in wanted}
+
+        self._partial_errors = {}
+        await self._ensure_login()
+        results, errors, timings = await self._run_plan(plan, seed=previous)
+        total = round(time.monotonic() - started, 3)
+        self.metrics.record_refresh(total)
+        if not results.get("codes"):
+            raise ApanovaError(
+                f"Nu am putut determina codul client: {errors.get('codes', 'răspuns gol')}"
+            )
+
+        _LOGGER.debug(
+            "Apanova refresh %s: %.3fs total (suma apelurilor %.3fs) %s",
+            sorted(plan),
+            total,
+            sum(timings.values()),
+            timings,
+        )
+
+        data = dict(previous)
+        for name in plan:
+            if name not in errors:
+                data[name] = results.get(name) or {}
+                if self._cache is not None:
+                    self._cache.put(name, data[name])
+        # seturile care n-au fost încărcate niciodată lipsesc (entitățile lor rămân indisponibile)
+        data["login_payload"] = self._login_payload
+        data["meters"] = self._meters_of(data)
+        self.last_errors = {**errors, **self._partial_errors}
+        self.last_timings = {"total": total, "endpoints": timings}
+        return data
+
+    def cached_data(self) -> tuple[dict[str, Any], dict[str, float]] | None:
+        """Datele din cache-ul persistent, în forma întoarsă de refresh(), plus vechimea lor."""
+        hit = self._cache.get("codes") if self._cache is not None else None
+        if not hit or not hit[0]:
+            return None
+        data: dict[str, Any] = {}
+        for name in self._plan():
+            hit = self._cache.get(name)
+            if hit:
+                data[name] = hit[0] or {}
+        data["login_payload"] = self._login_payload
+        data["meters"] = self._meters_of(data)
+        return data, self._cache.timestamps()
+
+    async def refresh_all(self) -> dict:
+        return await self.refresh()
@@ -2,8 +2,17 @@ from __future__ import annotations
 
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.core import callback
 
-from .const import CONF_EMAIL, CONF_PASSWORD, DOMAIN
+from .const import (
+    CONF_COMPACT_ATTRIBUTES,
+    CONF_EMAIL,
+    CONF_MAX_ROWS,
+    CONF_PASSWORD,
+    DEFAULT_MAX_ROWS,
+    DOMAIN,
+    MAX_ROWS_LIMIT,
+)
 
 
 class ApanovaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -19,3 +28,30 @@ class ApanovaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             }
         )
         return self.async_show_form(step_id="user", data_schema=data_schema)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry):
+        return ApanovaOptionsFlow(config_entry)
+
+
+class ApanovaOptionsFlow(config_entries.OptionsFlow):
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+        options = self._entry.options
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_COMPACT_ATTRIBUTES,
+                    default=options.get(CONF_COMPACT_ATTRIBUTES, False),
+                ): bool,
+                vol.Required(
+                    CONF_MAX_ROWS, default=options.get(CONF_MAX_ROWS, DEFAULT_MAX_ROWS)
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_ROWS_LIMIT)),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=data_schema)
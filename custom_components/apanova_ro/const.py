@@ -2,6 +2,151 @@ DOMAIN = "apanova_ro"
 PLATFORMS = ["sensor"]
 CONF_EMAIL = "email"
 CONF_PASSWORD = "password"
-UPDATE_INTERVAL_MINUTES = 180
+# tick-ul coordonatorului; fiecare set de date are propriul TTL (vezi DATASET_TIERS)
+UPDATE_INTERVAL_MINUTES = 15
+# limita de apeluri HTTP simultane într-un refresh
+MAX_CONCURRENT_REQUESTS = 4
 USER_AGENT = "okhttp/4.9.3"
+# reautentificare cu TOKEN_REFRESH_MARGIN sec înainte de `exp` din JWT;
+# dacă tokenul nu are `exp`, îl considerăm valid TOKEN_FALLBACK_TTL sec
+TOKEN_REFRESH_MARGIN = 300
+TOKEN_FALLBACK_TTL = 6 * 3600
+# gazde pentru care se folosesc cereri condiționale (ETag / Last-Modified / hash corp)
+CONDITIONAL_HOSTS = ("callistogateway.apanovabucuresti.ro",)
+# parametrii de perioadă nu deschid un slot nou de validatori (delta, ani de backfill)
+VALIDATOR_PERIOD_PARAMS = frozenset({"dateFrom", "dateTo", "year"})
+# corpul răspunsului se citește pe bucăți; peste limită cererea e abandonată
+MAX_RESPONSE_BYTES = 8 * 1024 * 1024
+RESPONSE_CHUNK_SIZE = 64 * 1024
+# reîncercări pentru GET-uri: câte încercări per clasă de endpoint, backoff exponențial
+# cu jitter (sau Retry-After pe 429/503), plafonat; un refresh are un buget total de timp
+RETRY_ATTEMPTS = {"gateway": 3, "auth": 2}
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+REQUEST_TIMEOUT = 30.0
+REFRESH_DEADLINE = 120.0
+# siguranță per gazdă: se deschide după BREAKER_FAILURES cereri consecutive eșuate (după
+# reîncercări) din cauza gazdei, adică timeout, eroare de conexiune sau BREAKER_STATUSES;
+# proba vine după BREAKER_RESET sec, dublat la fiecare probă eșuată până la BREAKER_MAX_RESET
+BREAKER_FAILURES = 3
+BREAKER_STATUSES = frozenset({502, 503, 504})
+BREAKER_RESET = 60.0
+BREAKER_MAX_RESET = 30 * 60.0
+# limitele (ms) histogramei de latență per endpoint
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
+# câte variante de login (url × formă payload) se încearcă simultan
+LOGIN_RACE_WIDTH = 2
 VERSION = "1.1.0"
+
+# clase de endpoint-uri și cât de des se reîmprospătează (minute)
+TIER_STATIC = "static"
+TIER_BILLING = "billing"
+TIER_VOLATILE = "volatile"
+TIER_TTL_MINUTES = {
+    TIER_STATIC: 24 * 60,
+    TIER_BILLING: 180,
+    TIER_VOLATILE: 30,
+}
+DATASET_TIERS = {
+    "user_details": TIER_STATIC,
+    "codes": TIER_STATIC,
+    "consumption": TIER_STATIC,
+    "contract": TIER_STATIC,
+    "payments": TIER_BILLING,
+    "invoices": TIER_BILLING,
+    "index_history": TIER_BILLING,
+    "unpaid": TIER_VOLATILE,
+    "check": TIER_VOLATILE,
+}
+# încărcare la cerere: un set se reîncarcă doar dacă are abonați (entități activate);
+# excepție: structura conturilor, din care se construiesc entitățile
+CORE_DATASETS = ("codes", "consumption")
+# aduse o singură dată, la prima încărcare (contoarele apar și în fereastra de citire)
+BOOTSTRAP_DATASETS = ("check",)
+# seturi fără entități proprii, aduse împreună cu cele de care țin
+DATASET_COMPANIONS = {"unpaid": ("payments",)}
+# polling adaptiv al seturilor de index, după starea contoarelor:
+# mod -> (TTL "check", TTL "index_history") în minute; sub tick = la fiecare tick
+POLL_WINDOW = "window"  # fereastra de autocitire e deschisă
+POLL_AFTER_READING = "after_reading"  # s-a transmis recent un index
+POLL_SMART = "smart"  # contoare inteligente: citirea nu depinde de fereastră
+POLL_IDLE = "idle"  # în afara ferestrei: indexul nu se poate schimba
+POLL_MODES = {
+    POLL_WINDOW: (10, 60),
+    POLL_AFTER_READING: (10, 10),
+    POLL_SMART: (60, 360),
+    POLL_IDLE: (360, 24 * 60),
+}
+# cât durează modul "after_reading" după ce se schimbă data ultimei citiri
+AFTER_READING_MINUTES = 120
+# ciclul de facturare, învățat din datele facturilor: mod -> TTL (minute) per set
+BILLING_ISSUE = "issue"  # în jurul datei estimate a următoarei facturi
+BILLING_QUIET = "quiet"  # restul lunii
+BILLING_MODES = {
+    BILLING_ISSUE: {"invoices": 60, "unpaid": 60, "payments": 180},
+    BILLING_QUIET: {"invoices": 24 * 60, "unpaid": 6 * 60, "payments": 12 * 60},
+}
+# fereastra densă: zile înainte / după data estimată a facturii
+BILLING_WINDOW_DAYS = (3, 7)
+# facturi necesare pentru a estima ciclul (altfel rămân TTL-urile tier-ului)
+BILLING_MIN_INVOICES = 3
+# după o plată nouă restanțele se verifică la fiecare tick, cât timp:
+AFTER_PAYMENT_MINUTES = 6 * 60
+AFTER_PAYMENT_TTL_MINUTES = 10
+
+# resurse comune tuturor conturilor (sesiune, limitare, calitatea apei): hass.data[DOMAIN][HUB_KEY]
+HUB_KEY = "_hub"
+SHARED_UPDATE_INTERVAL_MINUTES = TIER_TTL_MINUTES[TIER_VOLATILE]
+
+# câți ani încheiați se descarcă (o singură dată) în istoricul local
+HISTORY_MAX_YEARS = 5
+
+# unitatea statisticii externe a facturilor
+STATISTICS_CURRENCY = "RON"
+
+# opțiuni: tabelele ca o singură listă de înregistrări (mărginită), în loc de chei per rând
+CONF_COMPACT_ATTRIBUTES = "compact_attributes"
+CONF_MAX_ROWS = "max_rows"
+DEFAULT_MAX_ROWS = 12
+MAX_ROWS_LIMIT = 120
+ATTR_ROWS = "rows"
+ATTR_ROWS_TOTAL = "rows_total"
+SERVICE_GET_ROWS = "get_rows"
+
+# analiza consumului (analytics.py): perioade din istoricul de index
+ANALYTICS_ROLLING_PERIODS = 3  # media rulantă a consumului zilnic
+ANALYTICS_MIN_PERIODS = 4  # istoric minim pentru comparații / semnalări
+ANOMALY_ZSCORE = 3.0  # perioada curentă iese din distribuția celor anterioare
+LEAK_PERIODS = 3  # perioade consecutive peste referință -> posibilă scurgere
+LEAK_FACTOR = 1.5
+YOY_TOLERANCE_DAYS = 20  # perioada „de anul trecut” poate fi decalată cu atât
+
+# serviciul export: fișiere în <config>/EXPORT_DIR, scrise pe bucăți de EXPORT_CHUNK_ROWS rânduri
+SERVICE_EXPORT = "export"
+EXPORT_DIR = "apanova_ro_export"
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_DATASETS = ("invoices", "payments", "unpaid", "index", "water")
+
+# cache persistent (.storage): vechimea maximă pe tier (ore) după care intrarea e ignorată
+STORAGE_VERSION = 1
+# v2: seturile per cont sunt dicționare cod client -> payload
+CACHE_STORAGE_VERSION = 2
+CACHE_SAVE_DELAY = 10
+CACHE_MAX_AGE_HOURS = {
+    TIER_STATIC: 30 * 24,
+    TIER_BILLING: 7 * 24,
+    TIER_VOLATILE: 12,
+}
+
+# limitare globală pe gazdă: (cereri/sec, rafală maximă)
+HOST_RATE_LIMITS = {
+    "security-client.apanovabucuresti.ro": (1.0, 4),
+    "security-bo.apanovabucuresti.ro": (1.0, 4),
+    "client-authorization.apanovabucuresti.ro": (2.0, 6),
+    "callistogateway.apanovabucuresti.ro": (4.0, 10),
+}
+# eșalonarea refresh-urilor: pasul șirului de decalaje (1/φ) și jitter-ul relativ per tick
+STAGGER_STEP = 0.6180339887
+REFRESH_JITTER = 0.1
@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import Callable, Iterable
+from datetime import date, timedelta
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .analytics import ConsumptionAnalytics
+from .api import ApanovaClient, ApanovaError
+from .const import (
+    AFTER_PAYMENT_MINUTES,
+    AFTER_PAYMENT_TTL_MINUTES,
+    AFTER_READING_MINUTES,
+    BILLING_ISSUE,
+    BILLING_MODES,
+    BILLING_QUIET,
+    BILLING_WINDOW_DAYS,
+    BOOTSTRAP_DATASETS,
+    CORE_DATASETS,
+    DATASET_COMPANIONS,
+    POLL_AFTER_READING,
+    POLL_IDLE,
+    POLL_MODES,
+    POLL_SMART,
+    POLL_WINDOW,
+    REFRESH_JITTER,
+    SHARED_UPDATE_INTERVAL_MINUTES,
+    UPDATE_INTERVAL_MINUTES,
+)
+from .models import ApanovaModel, WaterQuality, parse_data, parse_water
+from .scheduler import RefreshScheduler, next_issue
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _ParsedData(ABC):
+    """Modelul tipizat al datelor curente și generația lor (crește la fiecare set nou)."""
+
+    _model: Any = None
+    _model_src: dict | None = None
+    _generation = 0
+    # seturile de date care au eșuat la ultima încercare (entitățile le servesc din datele vechi)
+    failing: frozenset[str] = frozenset()
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # set de date -> câte entități active depind de el
+        self._consumers: Counter[str] = Counter()
+        self._fetch_scheduled = False
+
+    def subscribe(self, datasets: Iterable[str]) -> Callable[[], None]:
+        """Înregistrează un consumator; un set nou și scadent se aduce imediat.
+
+        Întoarce funcția de dezabonare; seturile rămase fără consumatori nu se mai reîncarcă.
+        """
+        datasets = tuple(datasets)
+        new = [d for d in datasets if not self._consumers[d]]
+        self._consumers.update(datasets)
+        if not self._fetch_scheduled and any(self._is_due(d) for d in new):
+            # entitățile se adaugă în rafală: un singur refresh pentru toate
+            self._fetch_scheduled = True
+            self.hass.loop.call_soon(self._fetch_subscribed)
+
+        def _unsubscribe() -> None:
+            self._consumers -= Counter(datasets)
+
+        return _unsubscribe
+
+    @property
+    def consumers(self) -> dict[str, int]:
+        return dict(self._consumers)
+
+    @callback
+    def _fetch_subscribed(self) -> None:
+        self._fetch_scheduled = False
+        self.hass.async_create_task(self.async_request_refresh())
+
+    @abstractmethod
+    def _is_due(self, name: str) -> bool:
+        """True dacă setul `name` ar trebui reîncărcat acum."""
+
+    def _set_failing(self, failing: frozenset[str]) -> None:
+        if failing == self.failing:
+            return
+        self.failing = failing
+        if self.data is not None:
+            # datele pot fi identice, dar atributul de vechime al entităților se schimbă
+            self.hass.loop.call_soon(self.async_update_listeners)
+
+    @abstractmethod
+    def _parse(self, data: dict) -> Any:
+        """Construiește modelul din datele brute ale coordonatorului."""
+
+    def _sync_model(self) -> None:
+        if self._model is None or self._model_src is not self.data:
+            self._model = self._parse(self.data or {})
+            self._model_src = self.data
+            self._generation += 1
+
+    @property
+    def model(self) -> Any:
+        self._sync_model()
+        return self._model
+
+    @property
+    def generation(self) -> int:
+        """Identifică setul de date curent; entitățile își memorează derivatele pe el."""
+        self._sync_model()
+        return self._generation
+
+
+class DataCoordinator(_ParsedData, DataUpdateCoordinator):
+    def __init__(self, hass: HomeAssistant, client: ApanovaClient, stagger: float | None = None):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="apanova_ro",
+            update_interval=timedelta(minutes=UPDATE_INTERVAL_MINUTES),
+            # datele neschimbate (304 / același corp) nu mai declanșează scrieri de stare
+            always_update=False,
+        )
+        self.client = client
+        self.scheduler = RefreshScheduler()
+        # decalajul (sec) primului tick periodic, alocat de hub
+        self._stagger = stagger
+        # polling adaptiv: modul curent și data ultimei citiri văzute, per contor
+        self.poll_mode: str | None = None
+        self._reading_dates: dict[tuple[str, str], Any] = {}
+        self._after_reading_until = 0.0
+        # ciclul de facturare: modul curent, următoarea factură estimată, ultima plată văzută
+        self.billing: dict[str, Any] = {"mode": None, "next_invoice": None, "after_payment": False}
+        self._payment_dates: dict[str, Any] = {}
+        self._after_payment_until = 0.0
+        # analiza consumului, incrementală pe istoricul de index (o folosesc senzorii)
+        self.analytics = ConsumptionAnalytics()
+
+    def _parse(self, data: dict) -> ApanovaModel:
+        return parse_data(data)
+
+    def _is_due(self, name: str) -> bool:
+        return name in self.scheduler.due()
+
+    def wanted(self) -> set[str]:
+        """Seturile care merită încărcate: structura conturilor plus cele cu consumatori."""
+        wanted = set(CORE_DATASETS).union(self._consumers)
+        for name in list(wanted):
+            wanted.update(DATASET_COMPANIONS.get(name, ()))
+        wanted.update(d for d in BOOTSTRAP_DATASETS if d not in (self.data or {}))
+        return wanted
+
+    def stale_since(self, datasets: tuple[str, ...]) -> float | None:
+        """Momentul ultimei încărcări reușite, dacă vreunul din `datasets` e servit vechi."""
+        if not self.failing.intersection(datasets):
+            return None
+        return min((self.scheduler.fetched_at(n) for n in datasets), default=0.0) or None
+
+    def restore_from_cache(self) -> bool:
+        """Publică datele din cache-ul persistent; True dacă a existat ceva de publicat."""
+        cached = self.client.cached_data()
+        if cached is None:
+            return False
+        data, fetched_at = cached
+        for name, ts in fetched_at.items():
+            self.scheduler.mark_fetched([name], ts)
+        self.async_set_updated_data(data)
+        return True
+
+    def _next_interval(self) -> timedelta:
+        """Următorul tick: întâi decalajul alocat de hub, apoi intervalul normal ± jitter.
+
+        Dacă un set urmărit expiră mai devreme (TTL scurt din polling-ul adaptiv), tick-ul
+        se apropie până la el; seturile care tocmai au eșuat își așteaptă tick-ul normal.
+        """
+        tick = UPDATE_INTERVAL_MINUTES * 60
+        if self._stagger is not None:
+            delay, self._stagger = self._stagger, None
+        else:
+            delay = tick
+        delay += random.uniform(-REFRESH_JITTER, REFRESH_JITTER) * tick
+        delay = min(delay, self.scheduler.next_due(names=self.wanted() - self.failing))
+        return timedelta(seconds=max(60.0, delay))
+
+    def _adapt_polling(self, now: float | None = None) -> None:
+        """Alege TTL-ul seturilor "check" / "index_history" după starea contoarelor.
+
+        În fereastra de autocitire și imediat după o citire nouă se verifică des; în afara
+        ferestrei indexul nu se poate schimba, deci cererile se răresc puternic.
+        """
+        if not self.data:
+            return
+        now = time.time() if now is None else now
+        readings = [(cod, r) for cod, acc in self.model.accounts.items() for r in acc.readings]
+        for cod, r in readings:
+            key = (cod, str(r.meter))
+            seen = self._reading_dates.get(key)
+            if seen is not None and r.last_index_date and r.last_index_date != seen:
+                self._after_reading_until = now + AFTER_READING_MINUTES * 60
+                self.scheduler.invalidate("index_history")
+            self._reading_dates[key] = r.last_index_date or seen
+
+        if now < self._after_reading_until:
+            mode = POLL_AFTER_READING
+        elif any(r.window_open for _, r in readings):
+            mode = POLL_WINDOW
+        elif any(r.smart for _, r in readings):
+            mode = POLL_SMART
+        else:
+            mode = POLL_IDLE
+        if mode != self.poll_mode:
+            _LOGGER.debug("Polling index: %s -> %s", self.poll_mode, mode)
+            self.poll_mode = mode
+            check, history = POLL_MODES[mode]
+            self.scheduler.set_ttl("check", check * 60)
+            self.scheduler.set_ttl("index_history", history * 60)
+
+    def _adapt_billing(self, now: float | None = None) -> None:
+        """Alege TTL-ul seturilor de facturare după ciclul învățat din facturile trecute.
+
+        Dens în jurul datei estimate a următoarei facturi și imediat după o plată nouă,
+        rar în restul lunii; fără istoric suficient rămân TTL-urile tier-ului.
+        """
+        if not self.data:
+            return
+        now = time.time() if now is None else now
+        today = date.fromtimestamp(now)
+        before, after = (timedelta(days=d) for d in BILLING_WINDOW_DAYS)
+        expected = []
+        for cod, acc in self.model.accounts.items():
+            issue = next_issue((i.date for i in acc.invoices), today)
+            if issue is not None:
+                expected.append(issue)
+            last = acc.payments[-1].date if acc.payments else None
+            seen = self._payment_dates.get(cod)
+            if seen is not None and last is not None and last != seen:
+                self._after_payment_until = now + AFTER_PAYMENT_MINUTES * 60
+                self.scheduler.invalidate("unpaid")
+            self._payment_dates[cod] = last or seen
+
+        if any(e - before <= today <= e + after for e in expected):
+            mode = BILLING_ISSUE
+        elif expected:
+            mode = BILLING_QUIET
+        else:
+            mode = None
+        if mode != self.billing["mode"]:
+            _LOGGER.debug("Polling facturare: %s -> %s", self.billing["mode"], mode)
+        after_payment = now < self._after_payment_until
+        # un singur set_ttl per set și tick: fiecare schimbare înseamnă o nouă versiune
+        for name in BILLING_MODES[BILLING_QUIET]:
+            ttl = BILLING_MODES[mode][name] if mode else None
+            if name == "unpaid" and after_payment:
+                ttl = AFTER_PAYMENT_TTL_MINUTES
+            self.scheduler.set_ttl(name, ttl * 60 if ttl else None)
+        self.billing = {
+            "mode": mode,
+            "next_invoice": min(expected).isoformat() if expected else None,
+            "after_payment": after_payment,
+        }
+
+    async def _async_update_data(self):
+        self._adapt_polling()
+        self._adapt_billing()
+        wanted = self.wanted()
+        due = [n for n in self.scheduler.due() if n in wanted]
+        try:
+            if not due and self.data:
+                return self.data
+            try:
+                data = await self.client.refresh(due, self.data)
+            except ApanovaError as e:
+                self._set_failing(self.failing.union(due))
+                raise UpdateFailed(str(e)) from e
+            errors = self.client.last_errors
+            self.scheduler.mark_fetched(
+                n for n in self.client.last_timings["endpoints"] if n not in errors
+            )
+            # erorile parțiale au cheia "set/cod"
+            self._set_failing(frozenset(n.split("/", 1)[0] for n in errors))
+            return data
+        finally:
+            # după refresh: planificarea reflectă încărcările și eșecurile de acum
+            self.update_interval = self._next_interval()
+
+
+class SharedDataCoordinator(_ParsedData, DataUpdateCoordinator):
+    """Date independente de cont (calitatea apei), aduse o singură dată pentru toate intrările.
+
+    Folosește clientul oricărei intrări înregistrate; dacă unul eșuează, încearcă următorul.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="apanova_ro_shared",
+            update_interval=timedelta(minutes=SHARED_UPDATE_INTERVAL_MINUTES),
+            always_update=False,
+        )
+        self._clients: dict[str, ApanovaClient] = {}
+        self._first_refresh: asyncio.Task | None = None
+        self._fetched_at = 0.0
+
+    def _parse(self, data: dict) -> WaterQuality:
+        return parse_water(data)
+
+    def stale_since(self, datasets: tuple[str, ...]) -> float | None:
+        if not self.failing.intersection(datasets):
+            return None
+        return self._fetched_at or None
+
+    def _is_due(self, name: str) -> bool:
+        return time.time() - self._fetched_at >= SHARED_UPDATE_INTERVAL_MINUTES * 60
+
+    def register(self, entry_id: str, client: ApanovaClient) -> None:
+        self._clients[entry_id] = client
+
+    def unregister(self, entry_id: str) -> int:
+        """Scoate intrarea; întoarce câte intrări mai folosesc coordonatorul."""
+        self._clients.pop(entry_id, None)
+        return len(self._clients)
+
+    async def async_ensure_data(self) -> None:
+        """Primul refresh, partajat între intrările care pornesc simultan."""
+        if self.data is not None:
+            return
+        if self._first_refresh is None or self._first_refresh.done():
+            self._first_refresh = self.hass.async_create_task(self.async_refresh())
+        await asyncio.shield(self._first_refresh)
+
+    async def _async_update_data(self):
+        if not self._consumers["water"]:
+            # nicio entitate activă nu afișează calitatea apei
+            return self.data or {}
+        last_error: Exception | None = None
+        for client in list(self._clients.values()):
+            try:
+                data = {"water": await client.get_water_quality() or {}}
+            except ApanovaError as e:
+                last_error = e
+                continue
+            self._fetched_at = time.time()
+            self._set_failing(frozenset())
+            return data
+        self._set_failing(frozenset({"water"}))
+        raise UpdateFailed(f"Calitatea apei indisponibilă: {last_error}")
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_EMAIL, CONF_PASSWORD, DOMAIN, HUB_KEY
+
+TO_REDACT = {
+    CONF_EMAIL,
+    CONF_PASSWORD,
+    "token",
+    "accessToken",
+    "user_id",
+    "userId",
+    "cod_client",
+    "clientNumber",
+}
+
+
+def _redact_errors(errors: dict[str, str]) -> dict[str, str]:
+    """Erorile parțiale au cheia "set/cod": codul client devine un număr de ordine."""
+    codes: dict[str, str] = {}
+    out = {}
+    for key, message in errors.items():
+        name, sep, cod = key.partition("/")
+        if sep:
+            alias = codes.setdefault(cod, f"cont_{len(codes) + 1}")
+            message = message.replace(cod, alias)
+            key = f"{name}/{alias}"
+        out[key] = message
+    return out
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Diagnostic descărcabil din UI: fără date personale, doar starea integrării."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    client = data["client"]
+    coordinator = data["coordinator"]
+    hub = hass.data[DOMAIN].get(HUB_KEY)
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "login": {
+            "variant": client.login_variant,
+            "stats": client.login_stats,
+        },
+        "scheduler": coordinator.scheduler.as_dict(),
+        "consumers": coordinator.consumers,
+        "poll_mode": coordinator.poll_mode,
+        "billing": coordinator.billing,
+        "last_refresh": async_redact_data(
+            {
+                "success": coordinator.last_update_success,
+                "failing": sorted(coordinator.failing),
+                "errors": _redact_errors(client.last_errors),
+                "timings": client.last_timings,
+            },
+            TO_REDACT,
+        ),
+        "metrics": async_redact_data(client.metrics.as_dict(), TO_REDACT),
+        "circuits": {h: b.as_dict() for h, b in hub.breakers.items()} if hub else {},
+    }
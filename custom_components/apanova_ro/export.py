@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN, EXPORT_CHUNK_ROWS, EXPORT_DIR, HUB_KEY
+from .models import ApanovaModel, WaterQuality
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet e opțional; csv și jsonl merg fără dependențe
+    pa = pq = None
+
+# coloanele fiecărui set exportat; "float" = numeric (None dacă valoarea nu e număr)
+COLUMNS: dict[str, tuple[tuple[str, str], ...]] = {
+    "invoices": (("cod", "str"), ("data", "str"), ("suma", "float")),
+    "payments": (("cod", "str"), ("data", "str"), ("suma", "float")),
+    "unpaid": (("cod", "str"), ("data", "str"), ("suma", "float")),
+    "index": (
+        ("cod", "str"),
+        ("loc", "str"),
+        ("contor", "str"),
+        ("start", "str"),
+        ("sfarsit", "str"),
+        ("index", "float"),
+        ("consum", "float"),
+    ),
+    "water": (
+        ("actualizat", "str"),
+        ("sector", "str"),
+        ("clor", "float"),
+        ("ph", "float"),
+        ("turbiditate", "float"),
+    ),
+}
+
+
+def _day(dt: datetime | None) -> str | None:
+    return dt.date().isoformat() if dt is not None else None
+
+
+def _in_range(dt: datetime | None, start: date | None, end: date | None) -> bool:
+    if dt is None:
+        return start is None and end is None
+    return (start is None or dt.date() >= start) and (end is None or dt.date() <= end)
+
+
+def account_rows(
+    model: ApanovaModel, dataset: str, start: date | None = None, end: date | None = None
+) -> Iterator[dict[str, Any]]:
+    """Rândurile normalizate ale unui set per cont, generate pe măsură ce sunt scrise."""
+    for cod, acc in model.accounts.items():
+        if dataset == "index":
+            for key, periods in acc.history.items():
+                _, loc, contor = key.split("|")
+                for p in periods:
+                    if _in_range(p.end, start, end):
+                        yield {
+                            "cod": cod,
+                            "loc": loc,
+                            "contor": contor,
+                            "start": _day(p.start),
+                            "sfarsit": _day(p.end),
+                            "index": p.index,
+                            "consum": p.consumption,
+                        }
+            continue
+        items = {"invoices": acc.invoices, "payments": acc.payments, "unpaid": acc.unpaid}
+        for it in items[dataset]:
+            if _in_range(it.date, start, end):
+                yield {"cod": cod, "data": _day(it.date), "suma": it.amount}
+
+
+def water_rows(water: WaterQuality) -> Iterator[dict[str, Any]]:
+    for it in water.samples:
+        yield {
+            "actualizat": water.last_update,
+            "sector": it.sector,
+            "clor": it.clor,
+            "ph": it.ph,
+            "turbiditate": it.turbidity,
+        }
+
+
+def _chunks(rows: Iterable[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    it = iter(rows)
+    while chunk := list(islice(it, EXPORT_CHUNK_ROWS)):
+        yield chunk
+
+
+def _float(v: Any) -> float | None:
+    if isinstance(v, int | float):
+        return float(v)
+    try:
+        return float(str(v).replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _cell(v: Any, kind: str) -> Any:
+    if kind == "float":
+        return _float(v)
+    return None if v is None else str(v)
+
+
+def _write_csv(path: Path, columns: list[str], rows: Iterable[dict[str, Any]]) -> int:
+    count = 0
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for chunk in _chunks(rows):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def _write_jsonl(path: Path, columns: list[str], rows: Iterable[dict[str, Any]]) -> int:
+    count = 0
+    with path.open("w", encoding="utf-8") as f:
+        for chunk in _chunks(rows):
+            f.writelines(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in chunk)
+            count += len(chunk)
+    return count
+
+
+def _write_parquet(path: Path, dataset: str, rows: Iterable[dict[str, Any]]) -> int:
+    types = {"str": pa.string(), "float": pa.float64()}
+    schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS[dataset]])
+    count = 0
+    # un row group per bucată: memoria rămâne mărginită la EXPORT_CHUNK_ROWS rânduri
+    with pq.ParquetWriter(str(path), schema) as writer:
+        for chunk in _chunks(rows):
+            batch = {name: [_cell(r[name], kind) for r in chunk] for name, kind in COLUMNS[dataset]}
+            writer.write_table(pa.table(batch, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def write_export(path: Path, fmt: str, dataset: str, rows: Iterable[dict[str, Any]]) -> int:
+    """Scrie rândurile în `path` (blocant, rulează în executor); întoarce numărul lor.
+
+    Fișierul apare doar complet: se scrie sub un nume temporar și apoi se redenumește.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    columns = [name for name, _ in COLUMNS[dataset]]
+    try:
+        if fmt == "csv":
+            count = _write_csv(tmp, columns, rows)
+        elif fmt == "jsonl":
+            count = _write_jsonl(tmp, columns, rows)
+        else:
+            count = _write_parquet(tmp, dataset, rows)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return count
+
+
+async def async_export(
+    hass: HomeAssistant,
+    datasets: Iterable[str],
+    fmt: str,
+    start: date | None = None,
+    end: date | None = None,
+    entry_ids: Iterable[str] | None = None,
+) -> dict[str, Any]:
+    """Exportă seturile cerute din datele încărcate ale intrărilor; un fișier per set."""
+    if fmt == "parquet" and pa is None:
+        raise HomeAssistantError("Exportul parquet necesită pachetul pyarrow")
+    domain_data = hass.data.get(DOMAIN, {})
+    wanted = set(entry_ids) if entry_ids else None
+    models = [
+        data["coordinator"].model
+        for entry_id, data in domain_data.items()
+        if entry_id != HUB_KEY and (wanted is None or entry_id in wanted)
+    ]
+    hub = domain_data.get(HUB_KEY)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    folder = Path(hass.config.path(EXPORT_DIR))
+    files: dict[str, Any] = {}
+    for dataset in datasets:
+        if dataset == "water":
+            rows: Iterable[dict[str, Any]] = water_rows(hub.shared.model) if hub else ()
+        else:
+            rows = (r for m in models for r in account_rows(m, dataset, start, end))
+        path = folder / f"{dataset}_{stamp}.{fmt}"
+        count = await hass.async_add_executor_job(write_export, path, fmt, dataset, rows)
+        files[dataset] = {"path": str(path), "rows": count}
+    return {"files": files}
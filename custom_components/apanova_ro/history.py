@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import CACHE_SAVE_DELAY, DOMAIN, HISTORY_MAX_YEARS, STORAGE_VERSION
+
+KIND_INVOICES = "invoices"
+KIND_INDEX = "index"
+
+
+def invoice_date(it: dict[str, Any]) -> str:
+    return str(it.get("DateIn") or it.get("InvoiceDate") or it.get("date") or "")[:10]
+
+
+def period_date(it: dict[str, Any]) -> str:
+    return str(it.get("EndDate") or it.get("Date") or "")[:10]
+
+
+def _item_key(kind: str, it: dict[str, Any]) -> str:
+    """Identitatea stabilă a elementului: numărul facturii (altfel data), perioada indexului.
+
+    Valorile nu intră în cheie, ca o corectură să înlocuiască elementul, nu să-l dubleze.
+    """
+    if kind == KIND_INVOICES:
+        number = it.get("InvoiceNumber") or it.get("Number") or it.get("InvoiceNo")
+        return str(number) if number else invoice_date(it)
+    start = str(it.get("StartDate") or it.get("Start") or "")[:10]
+    return f"{start}|{period_date(it)}"
+
+
+def _item_date(kind: str, it: dict[str, Any]) -> str:
+    return invoice_date(it) if kind == KIND_INVOICES else period_date(it)
+
+
+class HistoryStore:
+    """Istoricul multi-anual de facturi și indecși, păstrat local.
+
+    Anii încheiați sunt perioade imuabile: se descarcă o singură dată (câte unul pe
+    ciclu, până la HISTORY_MAX_YEARS în urmă sau până când API-ul nu mai întoarce
+    nimic). Anul curent se actualizează incremental; datele noi le înlocuiesc pe cele
+    stocate cu aceeași identitate (facturi refăcute, indecși corectați).
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.history"
+        )
+        self._data: dict[str, dict[str, Any]] = {KIND_INVOICES: {}, KIND_INDEX: {}}
+
+    async def async_load(self) -> None:
+        raw = await self._store.async_load() or {}
+        for kind in (KIND_INVOICES, KIND_INDEX):
+            self._data[kind] = raw.get(kind) or {}
+
+    def _series(self, kind: str, key: str) -> dict[str, Any]:
+        return self._data[kind].setdefault(key, {"years": {}, "closed": [], "exhausted": False})
+
+    def last_date(self, kind: str, key: str, year: int) -> str | None:
+        """Cea mai recentă dată stocată pentru anul dat (baza pentru cererea delta)."""
+        items = self._series(kind, key)["years"].get(str(year)) or []
+        dates = [d for d in (_item_date(kind, it) for it in items) if d]
+        return max(dates) if dates else None
+
+    def has_year(self, kind: str, key: str, year: int) -> bool:
+        return str(year) in self._series(kind, key)["years"]
+
+    def next_backfill_year(self, kind: str, key: str, year: int) -> int | None:
+        """Următorul an încheiat de descărcat, sau None dacă istoricul e complet."""
+        series = self._series(kind, key)
+        closed = set(series["closed"])
+        # un an care era „curent” la ultima rulare trebuie închis cu o descărcare completă
+        for y in sorted(int(y) for y in series["years"]):
+            if y < year and y not in closed:
+                return y
+        if series["exhausted"]:
+            return None
+        oldest = min(closed | {year}) - 1
+        return oldest if oldest >= year - HISTORY_MAX_YEARS else None
+
+    def merge(
+        self, kind: str, key: str, year: int, items: list[dict], closed: bool = False
+    ) -> bool:
+        """Adaugă sau înlocuiește elementele anului; întoarce True dacă s-a schimbat ceva.
+
+        Un an deja închis nu se mai modifică.
+        """
+        series = self._series(kind, key)
+        if year in series["closed"]:
+            return False
+        current = series["years"].get(str(year)) or []
+        merged = {_item_key(kind, it): it for it in current}
+        for it in items:
+            if isinstance(it, dict):
+                merged[_item_key(kind, it)] = it
+        updated = sorted(merged.values(), key=lambda it: _item_date(kind, it))
+        changed = updated != current
+        series["years"][str(year)] = updated
+        if closed:
+            series["closed"].append(year)
+        if changed or closed:
+            self._store.async_delay_save(lambda: self._data, CACHE_SAVE_DELAY)
+        return changed
+
+    def mark_exhausted(self, kind: str, key: str) -> None:
+        """API-ul nu mai are date mai vechi: oprim backfill-ul."""
+        self._series(kind, key)["exhausted"] = True
+        self._store.async_delay_save(lambda: self._data, CACHE_SAVE_DELAY)
+
+    def items(self, kind: str, key: str) -> list[dict[str, Any]]:
+        """Toate elementele stocate, în ordine cronologică."""
+        years = self._series(kind, key)["years"]
+        return [it for y in sorted(years, key=int) for it in years[y]]
+
+    async def async_remove(self) -> None:
+        self._data = {KIND_INVOICES: {}, KIND_INDEX: {}}
+        await self._store.async_remove()
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from homeassistant.config_entries import current_entry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .api import ApanovaClient
+from .const import (
+    BREAKER_FAILURES,
+    BREAKER_MAX_RESET,
+    BREAKER_RESET,
+    HOST_RATE_LIMITS,
+    STAGGER_STEP,
+    UPDATE_INTERVAL_MINUTES,
+)
+from .coordinator import SharedDataCoordinator
+
+
+class TokenBucket:
+    """Limitator token-bucket: `rate` cereri/sec în medie, cu rafale de până la `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self._rate = rate
+        self._burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class CircuitBreaker:
+    """Siguranță pe gazdă: closed → open după `failures` eșecuri consecutive.
+
+    Cât e deschisă, cererile eșuează imediat. După `reset` sec trece în half-open și
+    lasă o singură cerere de probă: succesul o închide, eșecul o redeschide cu pauză dublă
+    (plafonată la `max_reset`).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failures: int, reset: float, max_reset: float):
+        self._threshold = failures
+        self._base_reset = reset
+        self._max_reset = max_reset
+        self._reset = reset
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        """Secunde până la următoarea probă (0 dacă nu e deschisă)."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._reset - time.monotonic())
+
+    def allow(self) -> bool:
+        """True dacă cererea poate pleca; în half-open, doar proba."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.retry_in == 0:
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def record(self, ok: bool) -> None:
+        if ok:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._reset = self._base_reset
+            return
+        self._failures += 1
+        if self.state == self.HALF_OPEN:
+            self._reset = min(self._reset * 2, self._max_reset)
+        if self.state == self.HALF_OPEN or self._failures >= self._threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def abort(self) -> None:
+        """Proba a fost anulată fără rezultat: următoarea cerere poate proba din nou."""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic() - self._reset
+
+    def as_dict(self) -> dict[str, float | str]:
+        return {"state": self.state, "failures": self._failures, "retry_in": self.retry_in}
+
+
+class ApanovaHub:
+    """Resurse comune tuturor conturilor Apanova din instanță.
+
+    - o singură sesiune HTTP (pool-ul de conexiuni al Home Assistant);
+    - câte un token-bucket pe gazdă Apanova, pentru toate intrările la un loc;
+    - câte o siguranță (circuit breaker) pe gazdă, ca o gazdă căzută să nu mai coste timeout-uri;
+    - decalaje de pornire pentru refresh-uri, ca intrările să nu lovească serverul simultan;
+    - coordonatorul datelor independente de cont (calitatea apei).
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self._limiters: dict[str, TokenBucket] = {}
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self._entries: list[str] = []
+        self._slots = 0
+        # coordonatorul comun nu aparține niciunei intrări: îl oprim noi la ultima descărcare
+        token = current_entry.set(None)
+        try:
+            self.shared = SharedDataCoordinator(hass)
+        finally:
+            current_entry.reset(token)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return async_get_clientsession(self._hass)
+
+    async def acquire(self, url: str) -> None:
+        """Așteaptă un token pentru gazda URL-ului (gazdele necunoscute nu sunt limitate)."""
+        host = urlsplit(url).hostname or ""
+        if host not in HOST_RATE_LIMITS:
+            return
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = TokenBucket(*HOST_RATE_LIMITS[host])
+        await limiter.acquire()
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).hostname or ""
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(
+                BREAKER_FAILURES, BREAKER_RESET, BREAKER_MAX_RESET
+            )
+        return breaker
+
+    def register(self, entry_id: str, client: ApanovaClient) -> float:
+        """Înregistrează intrarea; întoarce decalajul (sec) al primului ei refresh periodic.
+
+        Decalajele urmează șirul {k·φ} (φ = raportul de aur), care împrăștie uniform
+        intrările pe interval oricâte ar fi, fără să le cunoaștem numărul dinainte.
+        """
+        self._entries.append(entry_id)
+        self.shared.register(entry_id, client)
+        offset = (self._slots * STAGGER_STEP) % 1.0
+        self._slots += 1
+        return offset * UPDATE_INTERVAL_MINUTES * 60
+
+    def unregister(self, entry_id: str) -> int:
+        """Scoate intrarea; întoarce câte intrări mai folosesc hub-ul."""
+        if entry_id in self._entries:
+            self._entries.remove(entry_id)
+        self.shared.unregister(entry_id)
+        return len(self._entries)
+
+    async def async_close(self) -> None:
+        await self.shared.async_shutdown()
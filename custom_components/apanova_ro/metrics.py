@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+from typing import Any
+from urllib.parse import urlsplit
+
+from .const import LATENCY_BUCKETS_MS
+
+# segmentele variabile din cale (coduri client, id-uri utilizator) nu creează endpointuri
+# noi și nu ajung în diagnostic; orice segment cu cifre, în afară de versiunea API („v2”)
+_ID_SEGMENT = re.compile(r"/(?!v\d+(?=/|$))[^/]*\d[^/]*(?=/|$)")
+
+
+def endpoint_of(url: str) -> str:
+    """Numele endpointului: host + cale, fără query (token, coduri) și fără id-uri."""
+    parts = urlsplit(url)
+    return f"{parts.hostname}{_ID_SEGMENT.sub('/{id}', parts.path)}"
+
+
+class _Endpoint:
+    __slots__ = ("calls", "errors", "bytes", "status", "buckets", "total_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.status: dict[str, int] = {}
+        # histogramă cumulativă pe LATENCY_BUCKETS_MS (+ ultima, „peste”)
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["le_inf"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "status": dict(self.status),
+            "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "latency_ms": dict(zip(labels, self.buckets, strict=True)),
+        }
+
+
+class ClientMetrics:
+    """Contoarele apelurilor HTTP ale unui client, de la pornirea integrării.
+
+    `_fetch` înregistrează fiecare răspuns (latență, octeți, status); erorile de rețea
+    apar cu statusul 0. `revision` crește la fiecare refresh încheiat.
+    """
+
+    def __init__(self) -> None:
+        self._endpoints: dict[str, _Endpoint] = {}
+        self.counters: dict[str, int] = {}
+        self.revision = 0
+        self.last_refresh: float | None = None
+        self.refreshes = 0
+        self._refresh_total = 0.0
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Apelat după fiecare refresh; întoarce funcția de dezabonare."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def record(self, url: str, status: int, elapsed: float, size: int = 0) -> None:
+        name = endpoint_of(url)
+        ep = self._endpoints.get(name)
+        if ep is None:
+            ep = self._endpoints[name] = _Endpoint()
+        ms = elapsed * 1000
+        ep.calls += 1
+        ep.bytes += size
+        ep.total_ms += ms
+        ep.max_ms = max(ep.max_ms, ms)
+        ep.status[str(status)] = ep.status.get(str(status), 0) + 1
+        if status == 0 or status >= 400:
+            ep.errors += 1
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                ep.buckets[i] += 1
+        ep.buckets[-1] += 1
+
+    def count(self, name: str) -> None:
+        """Contor simplu: relogin, răspunsuri 304, reîncercări etc."""
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def record_refresh(self, elapsed: float) -> None:
+        self.last_refresh = round(elapsed, 3)
+        self.refreshes += 1
+        self._refresh_total += elapsed
+        self.revision += 1
+        for listener in list(self._listeners):
+            listener()
+
+    def endpoints(self) -> dict[str, dict[str, Any]]:
+        return {name: ep.as_dict() for name, ep in sorted(self._endpoints.items())}
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "refresh": {
+                "count": self.refreshes,
+                "last_s": self.last_refresh,
+                "avg_s": round(self._refresh_total / self.refreshes, 3) if self.refreshes else 0.0,
+            },
+            "counters": dict(self.counters),
+            "endpoints": self.endpoints(),
+        }
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from .api import _content
+
+
+def _parse_dt(v: Any) -> datetime | None:
+    if not v:
+        return None
+    try:
+        return datetime.fromisoformat(str(v)[:10])
+    except ValueError:
+        return None
+
+
+def _amount(v: Any) -> float:
+    try:
+        return float(str(v).replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+def _number(v: Any) -> int | float | Any:
+    """int dacă se poate, altfel float (acceptă virgulă zecimală), altfel valoarea brută."""
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        try:
+            return float(str(v).replace(",", "."))
+        except ValueError:
+            return v
+
+
+def _list(o: Any, key: str) -> list:
+    v = o.get(key) if isinstance(o, dict) else None
+    return v if isinstance(v, list) else []
+
+
+@dataclass(slots=True, frozen=True)
+class Invoice:
+    date: datetime
+    amount: float
+
+
+@dataclass(slots=True, frozen=True)
+class Payment:
+    date: datetime
+    amount: float
+
+
+@dataclass(slots=True, frozen=True)
+class UnpaidInvoice:
+    date: datetime | None
+    amount: float
+
+
+@dataclass(slots=True, frozen=True)
+class MeterReading:
+    meter: Any
+    consumption_point: Any
+    last_index: int | float | Any
+    last_index_date: Any
+    in_window: Any
+    is_smart: Any
+
+    @property
+    def window_open(self) -> bool:
+        return _flag(self.in_window)
+
+    @property
+    def smart(self) -> bool:
+        return _flag(self.is_smart)
+
+
+@dataclass(slots=True, frozen=True)
+class IndexPeriod:
+    start: datetime | None
+    end: datetime
+    index: int | float | Any
+    consumption: int | float | Any
+
+
+@dataclass(slots=True, frozen=True)
+class WaterSample:
+    sector: Any
+    clor: Any
+    ph: Any
+    turbidity: Any
+
+
+@dataclass(slots=True, frozen=True)
+class UserInfo:
+    email: str | None = None
+    name: str | None = None
+    phone: str | None = None
+    client_number: str | None = None
+    contract_number: str | None = None
+
+
+@dataclass(slots=True)
+class Account:
+    cod: str
+    address: Any = None
+    installation: Any = None
+    consumption_point: Any = None
+    meter: Any = None
+    contract_number: Any = None
+    # facturi cu dată validă, cronologic
+    invoices: tuple[Invoice, ...] = ()
+    # restanțe în ordinea API-ului
+    unpaid: tuple[UnpaidInvoice, ...] = ()
+    # plăți cu dată validă, cronologic
+    payments: tuple[Payment, ...] = ()
+    readings: tuple[MeterReading, ...] = ()
+    # "cod|loc|contor" -> perioade, cronologic după EndDate
+    history: dict[str, tuple[IndexPeriod, ...]] = field(default_factory=dict)
+
+    def reading(self, meter: Any) -> MeterReading | None:
+        """Citirea contorului dat; fără contor (entitatea veche, un singur contor), prima."""
+        if meter is None:
+            return self.readings[0] if self.readings else None
+        for r in self.readings:
+            if str(r.meter) == str(meter):
+                return r
+        return None
+
+
+@dataclass(slots=True, frozen=True)
+class WaterQuality:
+    last_update: Any = None
+    samples: tuple[WaterSample, ...] = ()
+
+
+@dataclass(slots=True)
+class ApanovaModel:
+    user: UserInfo = field(default_factory=UserInfo)
+    accounts: dict[str, Account] = field(default_factory=dict)
+
+
+def _parse_user(user_details: dict) -> UserInfo:
+    user_data = user_details.get("userData") or {}
+    payload = user_data.get("Payload") or {}
+    ln = payload.get("lastname") or payload.get("lastName") or ""
+    fn = payload.get("firstname") or payload.get("firstName") or ""
+    return UserInfo(
+        email=payload.get("email") or user_data.get("EMail"),
+        name=f"{ln} {fn}".strip() or None,
+        phone=payload.get("mobile"),
+        client_number=payload.get("clientNumber"),
+        contract_number=payload.get("contractNumber"),
+    )
+
+
+def _parse_invoices(payload: Any) -> tuple[Invoice, ...]:
+    out = []
+    for it in _list(_content(payload or {}), "Invoices"):
+        d = it.get("DateIn") or it.get("InvoiceDate") or it.get("date")
+        amt = it.get("Total") or it.get("value") or it.get("amount")
+        dt = _parse_dt(d)
+        if dt is not None and amt is not None:
+            out.append(Invoice(dt, _amount(amt)))
+    out.sort(key=lambda i: i.date)
+    return tuple(out)
+
+
+def _parse_unpaid(payload: Any) -> tuple[UnpaidInvoice, ...]:
+    out = []
+    for it in _list(_content(payload or {}), "Invoices"):
+        v = it.get("Sold") or it.get("Total") or it.get("value") or it.get("amount")
+        if v is None:
+            continue
+        d = it.get("DateIn") or it.get("InvoiceDate") or it.get("date")
+        out.append(UnpaidInvoice(_parse_dt(d), _amount(v)))
+    return tuple(out)
+
+
+def _parse_payments(payload: Any) -> tuple[Payment, ...]:
+    out = []
+    for it in _list(_content(payload or {}), "Payments"):
+        d = it.get("PaymentDate") or it.get("DateIn") or it.get("Date") or it.get("date")
+        amt = it.get("Amount") or it.get("Total") or it.get("Value") or it.get("value")
+        dt = _parse_dt(d)
+        if dt is not None:
+            out.append(Payment(dt, _amount(amt) if amt is not None else 0.0))
+    out.sort(key=lambda p: p.date)
+    return tuple(out)
+
+
+def _flag(value: Any) -> bool:
+    """Flag-urile API-ului vin ca bool, 0/1 sau text ("true", "Da")."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "da", "yes")
+    return bool(value)
+
+
+def _parse_readings(payload: Any) -> tuple[MeterReading, ...]:
+    out = []
+    for d in _list(_content(payload or {}), "MeterReadingDetails"):
+        if not isinstance(d, dict):
+            continue
+        v = d.get("LastIndex")
+        out.append(
+            MeterReading(
+                meter=d.get("Sernr"),
+                consumption_point=d.get("ConsumptionPointIdentifier"),
+                last_index=_number(v) if v is not None else None,
+                last_index_date=d.get("LastIndexDate"),
+                in_window=d.get("Inperioada"),
+                is_smart=d.get("IsSmart"),
+            )
+        )
+    return tuple(out)
+
+
+def _parse_history(payload: Any) -> tuple[IndexPeriod, ...]:
+    points = _list(_content(payload or {}), "ConsumptionPoints")
+    by_meter = _list(points[0], "IndexHistoryByMeter") if points else []
+    entries = _list(by_meter[0], "MeterIndexList") if by_meter else []
+    out = []
+    for it in entries:
+        sd = it.get("StartDate") or it.get("Start")
+        ed = it.get("EndDate") or it.get("Date")
+        idx = it.get("Index")
+        cons = it.get("Consumption") or it.get("Cons")
+        if not (ed and idx):
+            continue
+        edt = _parse_dt(ed)
+        if edt is None or (sd and _parse_dt(sd) is None):
+            continue
+        out.append(
+            IndexPeriod(
+                start=_parse_dt(sd),
+                end=edt,
+                index=_number(idx),
+                consumption=_number(cons) if cons is not None else None,
+            )
+        )
+    out.sort(key=lambda p: p.end)
+    return tuple(out)
+
+
+def parse_data(data: dict[str, Any]) -> ApanovaModel:
+    """Transformă o singură dată datele brute ale coordonatorului în modele tipizate."""
+    model = ApanovaModel(user=_parse_user(data.get("user_details") or {}))
+    history = data.get("index_history") or {}
+    for cod in data.get("codes") or []:
+        consumption = _content((data.get("consumption") or {}).get(cod) or {})
+        contract = _content((data.get("contract") or {}).get(cod) or {})
+        if not isinstance(contract, dict):
+            contract = {}
+        info_list = _list(consumption, "ConsumptionPointInfo")
+        info = info_list[0] if info_list and isinstance(info_list[0], dict) else {}
+        meters = info.get("ConsumptionMeters") or []
+        model.accounts[cod] = Account(
+            cod=cod,
+            address=info.get("ConsumptionClientAddress"),
+            installation=info.get("ConsumptionInstallation") or contract.get("Installation"),
+            consumption_point=info.get("ConsumptionPointCode"),
+            meter=meters[0] if meters else None,
+            contract_number=contract.get("ContractNumberWithAnb") or contract.get("ContractNumber"),
+            invoices=_parse_invoices((data.get("invoices") or {}).get(cod)),
+            unpaid=_parse_unpaid((data.get("unpaid") or {}).get(cod)),
+            payments=_parse_payments((data.get("payments") or {}).get(cod)),
+            readings=_parse_readings((data.get("check") or {}).get(cod)),
+            history={
+                key: _parse_history(payload)
+                for key, payload in history.items()
+                if key.split("|", 1)[0] == cod
+            },
+        )
+    return model
+
+
+def parse_water(data: dict[str, Any]) -> WaterQuality:
+    water = _content(data.get("water") or {})
+    if not isinstance(water, dict):
+        return WaterQuality()
+    return WaterQuality(
+        last_update=water.get("LastUpdateDate"),
+        samples=tuple(
+            WaterSample(it.get("Sector"), it.get("Clor"), it.get("PH"), it.get("Turbiditate"))
+            for it in _list(water, "WaterDetails")
+            if isinstance(it, dict)
+        ),
+    )
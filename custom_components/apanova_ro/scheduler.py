@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import statistics
+import time
+from collections.abc import Callable, Iterable
+from datetime import date, datetime, timedelta
+
+from .const import BILLING_MIN_INVOICES, BILLING_WINDOW_DAYS, DATASET_TIERS, TIER_TTL_MINUTES
+
+
+def next_issue(dates: Iterable[datetime], today: date) -> date | None:
+    """Data estimată a următoarei facturi, din intervalul median dintre facturile trecute.
+
+    Facturile la mai puțin de 20 de zile una de alta (corecții, stornări) nu intră în calcul.
+    Întoarce prima dată estimată a cărei fereastră densă nu s-a încheiat încă.
+    """
+    days = sorted({d.date() for d in dates})[-13:]
+    if len(days) < BILLING_MIN_INVOICES:
+        return None
+    gaps = [(b - a).days for a, b in zip(days, days[1:], strict=False) if (b - a).days >= 20]
+    if not gaps:
+        return None
+    step = timedelta(days=round(statistics.median(gaps)))
+    expected = days[-1] + step
+    while expected + timedelta(days=BILLING_WINDOW_DAYS[1]) < today:
+        expected += step
+    return expected
+
+
+class RefreshScheduler:
+    """Ține evidența momentului ultimei încărcări pentru fiecare set de date.
+
+    Fiecare set aparține unui tier (static / facturare / volatil) cu TTL propriu;
+    la fiecare tick al coordonatorului se reîncarcă doar seturile expirate.
+    """
+
+    def __init__(self, tiers: dict[str, str] | None = None):
+        self._tiers = dict(tiers or DATASET_TIERS)
+        self._fetched_at: dict[str, float] = {}
+        # TTL-uri (sec) impuse din afară, peste cele ale tier-ului (polling adaptiv)
+        self._ttl_overrides: dict[str, float] = {}
+        # crește la fiecare schimbare a planificării (încărcare reușită, TTL nou)
+        self.version = 0
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Apelat la fiecare schimbare a planificării; întoarce funcția de dezabonare."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _changed(self) -> None:
+        self.version += 1
+        for listener in list(self._listeners):
+            listener()
+
+    @property
+    def datasets(self) -> list[str]:
+        return list(self._tiers)
+
+    def ttl(self, name: str) -> float:
+        """TTL în secunde pentru un set de date."""
+        if name in self._ttl_overrides:
+            return self._ttl_overrides[name]
+        return TIER_TTL_MINUTES[self._tiers[name]] * 60
+
+    def set_ttl(self, name: str, seconds: float | None) -> None:
+        """Înlocuiește TTL-ul tier-ului pentru `name` (None revine la tier)."""
+        if self._ttl_overrides.get(name) == seconds:
+            return
+        if seconds is None:
+            self._ttl_overrides.pop(name, None)
+        else:
+            self._ttl_overrides[name] = seconds
+        self._changed()
+
+    def fetched_at(self, name: str) -> float:
+        """Momentul (epoch sec) ultimei încărcări reușite; 0 dacă nu a existat."""
+        return self._fetched_at.get(name, 0.0)
+
+    def next_fetch(self, name: str) -> float:
+        """Momentul (epoch sec) la care setul devine scadent."""
+        return self._fetched_at.get(name, 0.0) + self.ttl(name)
+
+    def due(self, now: float | None = None) -> list[str]:
+        now = time.time() if now is None else now
+        return [n for n in self._tiers if now - self._fetched_at.get(n, 0.0) >= self.ttl(n)]
+
+    def mark_fetched(self, names: Iterable[str], now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        changed = False
+        for n in names:
+            self._fetched_at[n] = now
+            changed = True
+        if changed:
+            self._changed()
+
+    def invalidate(self, *names: str) -> None:
+        """Forțează reîncărcarea la următorul tick."""
+        for n in names or tuple(self._tiers):
+            self._fetched_at.pop(n, None)
+        self._changed()
+
+    def next_due(self, now: float | None = None, names: Iterable[str] | None = None) -> float:
+        """Secunde până când expiră primul set din `names` (toate implicit; 0 dacă e scadent)."""
+        now = time.time() if now is None else now
+        return max(
+            0.0,
+            min(
+                (self.next_fetch(n) - now for n in (self._tiers if names is None else names)),
+                default=float("inf"),
+            ),
+        )
+
+    def as_dict(self) -> dict[str, dict[str, float | str]]:
+        return {
+            n: {
+                "tier": t,
+                "ttl": self.ttl(n),
+                "fetched_at": self._fetched_at.get(n, 0.0),
+                "next_fetch": self.next_fetch(n),
+            }
+            for n, t in self._tiers.items()
+        }
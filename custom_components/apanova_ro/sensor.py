@@ -4,13 +4,22 @@ import logging
 from datetime import datetime
 from typing import Any
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .api import _content
-from .const import DOMAIN
+from .const import (
+    ANALYTICS_MIN_PERIODS,
+    ATTR_ROWS,
+    ATTR_ROWS_TOTAL,
+    CONF_COMPACT_ATTRIBUTES,
+    CONF_MAX_ROWS,
+    DEFAULT_MAX_ROWS,
+    DOMAIN,
+)
+from .models import Account, IndexPeriod, UnpaidInvoice
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,6 +37,21 @@ RO_MONTHS = {
     11: "noiembrie",
     12: "decembrie",
 }
+# prescurtările folosite în etichetele istoricului de index
+RO_MONTHS_SHORT = {
+    1: "Ian",
+    2: "Feb",
+    3: "Mar",
+    4: "Apr",
+    5: "Mai",
+    6: "Iun",
+    7: "Iul",
+    8: "Aug",
+    9: "Sep",
+    10: "Oct",
+    11: "Noi",
+    12: "Dec",
+}
 
 
 def money_num(v) -> float:
@@ -37,53 +61,161 @@ def money_num(v) -> float:
         return 0.0
 
 
+# 1,234.50 -> 1.234,50
+_RO_NUMBER = str.maketrans(",.", ".,")
+
+
 def money(v) -> str:
     try:
-        x = float(str(v).replace(",", "."))
-        s = f"{x:,.2f}"
-        s = s.replace(",", "X").replace(".", ",").replace("X", ".")
-        return f"{s} lei"
+        x = v if isinstance(v, float) else float(str(v).replace(",", "."))
+        return f"{x:,.2f} lei".translate(_RO_NUMBER)
     except Exception:
         return f"{v}"
 
 
 def money_state(v) -> str:
     try:
-        x = float(str(v).replace(",", "."))
-        s = f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        return s
+        x = v if isinstance(v, float) else float(str(v).replace(",", "."))
+        return f"{x:,.2f}".translate(_RO_NUMBER)
     except Exception:
         return "0,00"
 
 
+def in_last_12_months(dt: datetime) -> bool:
+    """Luna curentă și cele 11 dinainte (numele lunilor rămân unice ca atribute)."""
+    now = datetime.now()
+    return (dt.year, dt.month) > (now.year - 1, now.month)
+
+
+def build_entities(coordinator, shared, entry, client) -> list[SensorEntity]:
+    """Entitățile unei intrări, după codurile și contoarele din datele coordonatorului."""
+    cdata = coordinator.data or {}
+    entities: list[SensorEntity] = []
+    # primul cod / primul contor păstrează unique_id-urile și entity_id-urile istorice
+    for i, cod in enumerate(cdata.get("codes") or []):
+        entities += [
+            ApanovaDateUtilizatorSensor(coordinator, entry, cod, primary=i == 0),
+            ApanovaArhivaFacturiSensor(coordinator, entry, cod, primary=i == 0),
+            ApanovaFacturaRestantaSensor(coordinator, entry, cod, primary=i == 0),
+            ApanovaFacturaEstimataSensor(coordinator, entry, cod, primary=i == 0),
+        ]
+        meters = (cdata.get("meters") or {}).get(cod) or ([] if i else [[None, None]])
+        for j, (loc, contor) in enumerate(meters):
+            primary = i == 0 and j == 0
+            entities += [
+                ApanovaIndexCurentSensor(coordinator, entry, cod, loc, contor, primary),
+                ApanovaIstoricIndexSensor(coordinator, entry, cod, loc, contor, primary),
+                ApanovaConsumZilnicSensor(coordinator, entry, cod, loc, contor, primary),
+                ApanovaAlertaConsumSensor(coordinator, entry, cod, loc, contor, primary),
+            ]
+    entities.append(ApanovaCalitateApaSensor(shared, entry))
+    entities.append(ApanovaMetricsSensor(coordinator, entry, client=client))
+    return entities
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ):
     data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
-    async_add_entities(
-        [
-            ApanovaDateUtilizatorSensor(coordinator, entry),
-            ApanovaArhivaFacturiSensor(coordinator, entry),
-            ApanovaFacturaRestantaSensor(coordinator, entry),
-            ApanovaIndexCurentSensor(coordinator, entry),
-            ApanovaIstoricIndexSensor(coordinator, entry),
-            ApanovaCalitateApaSensor(coordinator, entry),
-        ],
-        True,
-    )
+    entities = build_entities(data["coordinator"], data["shared"], entry, data["client"])
+    # serviciul get_rows caută aici entitățile-tabel ale intrării
+    data["entities"] = entities
+    async_add_entities(entities, True)
 
 
 class BaseApanovaSensor(SensorEntity):
     _attr_has_entity_name = True
+    # în modul compact tabelul nu ajunge în recorder; se citește cu serviciul get_rows
+    _unrecorded_attributes = frozenset({ATTR_ROWS, ATTR_ROWS_TOTAL})
+    _key = ""
+    # seturile de date din care provine starea (pentru atributul de vechime)
+    _datasets: tuple[str, ...] = ()
 
-    def __init__(self, coordinator, entry):
+    def __init__(self, coordinator, entry, cod=None, loc=None, contor=None, primary=True):
         self.coordinator = coordinator
         self._entry = entry
+        self._cod = cod
+        self._loc = loc
+        self._contor = contor
+        self._compact = entry.options.get(CONF_COMPACT_ATTRIBUTES, False)
+        self._max_rows = entry.options.get(CONF_MAX_ROWS, DEFAULT_MAX_ROWS)
+        # (generația datelor, valoare, atribute) – derivatele se calculează o dată per refresh
+        self._derived: tuple[Any, Any, dict[str, Any]] | None = None
+        self._written: tuple | None = None
+        if primary:
+            self.entity_id = f"sensor.apanova_{self._key}"
+            self._attr_unique_id = f"{entry.entry_id}_{self._key}"
+        else:
+            suffix = contor or cod
+            self.entity_id = f"sensor.apanova_{self._key}_{suffix}"
+            self._attr_unique_id = f"{entry.entry_id}_{suffix}_{self._key}"
+            self._attr_name = f"{self._attr_name} ({suffix})"
+
+    @property
+    def _account(self) -> Account:
+        """Modelul contului (codului client) entității."""
+        return self.coordinator.model.accounts.get(self._cod) or Account(cod=self._cod or "")
+
+    def _history_key(self) -> str | None:
+        """Cheia istoricului de index ("cod|loc|contor"); fără contor, primul istoric."""
+        if self._contor is None:
+            return next(iter(self._account.history), None)
+        return f"{self._cod}|{self._loc}|{self._contor}"
+
+    def _periods(self) -> tuple[IndexPeriod, ...]:
+        return self._account.history.get(self._history_key(), ())
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        """(native_value, extra_state_attributes) calculate din modelul curent."""
+        return None, {}
+
+    def rows(self) -> list[dict[str, Any]]:
+        """Toate rândurile tabelului entității (gol pentru senzorii fără tabel)."""
+        return []
+
+    def _compact_attrs(self, rows: list[dict[str, Any]], **summary: Any) -> dict[str, Any]:
+        attrs: dict[str, Any] = {
+            ATTR_ROWS: rows[: self._max_rows],
+            ATTR_ROWS_TOTAL: len(rows),
+            **summary,
+        }
+        attrs["icon"] = self._attr_icon
+        attrs["friendly_name"] = self._attr_name
+        return attrs
+
+    def _revision(self) -> Any:
+        """Cheia memorării derivatelor: generația datelor coordonatorului."""
+        return self.coordinator.generation
+
+    def _state(self) -> tuple[Any, dict[str, Any]]:
+        generation = self._revision()
+        if self._derived is None or self._derived[0] != generation:
+            self._derived = (generation, *self._compute())
+        _, value, attrs = self._derived
+        # refresh eșuat: rămânem pe ultimele date bune și spunem de când sunt
+        since = self.coordinator.stale_since(self._datasets) if self._datasets else None
+        if since is not None:
+            attrs = {
+                **attrs,
+                "date_vechi": True,
+                "actualizat_la": datetime.fromtimestamp(since).isoformat(timespec="seconds"),
+            }
+        return value, attrs
+
+    @property
+    def native_value(self):
+        return self._state()[0]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return self._state()[1]
 
     @property
     def available(self) -> bool:
-        return self.coordinator.last_update_success
+        # cu date deja încărcate entitatea rămâne disponibilă (vezi atributul date_vechi);
+        # seturile încă neaduse (încărcare la cerere) o lasă indisponibilă
+        data = self.coordinator.data
+        return bool(data) and all(d in data for d in self._datasets)
 
     async def async_update(self):
         await self.coordinator.async_request_refresh()
@@ -92,410 +224,305 @@ class BaseApanovaSensor(SensorEntity):
     def should_poll(self) -> bool:
         return False
 
+    def _handle_coordinator_update(self) -> None:
+        """Scrie starea doar dacă valoarea, atributele sau disponibilitatea s-au schimbat."""
+        value, attrs = self._state()
+        current = (self.available, value, attrs)
+        if current == self._written:
+            return
+        self._written = current
+        self.async_write_ha_state()
+
     async def async_added_to_hass(self) -> None:
-        self.async_on_remove(self.coordinator.async_add_listener(self.async_write_ha_state))
+        self.async_on_remove(self.coordinator.async_add_listener(self._handle_coordinator_update))
+        # entitățile dezactivate nu ajung aici, deci seturile lor nu se mai încarcă
+        self.async_on_remove(self.coordinator.subscribe(self._datasets))
 
 
 class ApanovaDateUtilizatorSensor(BaseApanovaSensor):
     _attr_icon = "mdi:account"
     _attr_name = "Apanova – Date utilizator/contract"
-
-    def __init__(self, coordinator, entry):
-        super().__init__(coordinator, entry)
-        self.entity_id = "sensor.apanova_date_utilizator"
-
-    @property
-    def unique_id(self) -> str:
-        return f"{self._entry.entry_id}_date_utilizator"
-
-    @property
-    def native_value(self):
-        return (self.coordinator.data.get("cod") or "").lstrip("0")
-
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        d = self.coordinator.data
-        u = d.get("user_details") or {}
-        payload = (u.get("userData") or {}).get("Payload") or {}
-        consumption = _content(d.get("consumption") or {})
-        contract = _content(d.get("contract") or {})
-        info = None
-        if isinstance(consumption, dict):
-            info_list = consumption.get("ConsumptionPointInfo") or []
-            if isinstance(info_list, list) and info_list:
-                info = info_list[0]
-        addr = (info or {}).get("ConsumptionClientAddress")
-        installation = (info or {}).get("ConsumptionInstallation") or contract.get("Installation")
-        cpcode = (info or {}).get("ConsumptionPointCode")
-        meters = (info or {}).get("ConsumptionMeters") or []
-        contor = meters[0] if meters else None
-
-        email = payload.get("email") or (u.get("userData") or {}).get("EMail")
-        ln = payload.get("lastname") or payload.get("lastName") or ""
-        fn = payload.get("firstname") or payload.get("firstName") or ""
-        name = f"{ln} {fn}".strip() or None
-        phone = payload.get("mobile")
-        client_number = payload.get("clientNumber") or d.get("cod")
-        contract_nr = (
-            payload.get("contractNumber")
-            or contract.get("ContractNumberWithAnb")
-            or contract.get("ContractNumber")
-        )
-
-        return {
-            "email": email,
-            "nume": name,
-            "telefon": phone,
-            "adresa": addr,
-            "cod client": client_number,
-            "installation_number": installation,
-            "cod_loc_consum": cpcode,
-            "contor": contor,
-            "contract": contract_nr,
+    _key = "date_utilizator"
+    _datasets = ("user_details", "consumption", "contract")
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        user = self.coordinator.model.user
+        acc = self._account
+        return (self._cod or "").lstrip("0"), {
+            "email": user.email,
+            "nume": user.name,
+            "telefon": user.phone,
+            "adresa": acc.address,
+            "cod client": self._cod or user.client_number,
+            "installation_number": acc.installation,
+            "cod_loc_consum": acc.consumption_point,
+            "contor": acc.meter,
+            "contract": user.contract_number or acc.contract_number,
             "icon": "mdi:account",
-            "friendly_name": "Apanova – Date utilizator/contract",
+            "friendly_name": self._attr_name,
         }
 
 
 class ApanovaArhivaFacturiSensor(BaseApanovaSensor):
     _attr_icon = "mdi:cash-register"
     _attr_name = "Apanova – Arhivă facturi"
-
-    def __init__(self, coordinator, entry):
-        super().__init__(coordinator, entry)
-        self.entity_id = "sensor.apanova_arhiva_facturi"
-
-    @property
-    def unique_id(self) -> str:
-        return f"{self._entry.entry_id}_arhiva_facturi"
-
-    @property
-    def native_value(self):
-        inv = _content(self.coordinator.data.get("invoices") or {})
-        invoices = inv.get("Invoices") or []
-        latest = None
-        latest_dt = None
-        for it in invoices:
-            d = it.get("DateIn") or it.get("InvoiceDate") or it.get("date")
-            amt = it.get("Total") or it.get("value") or it.get("amount")
-            if d and amt is not None:
-                try:
-                    dt = datetime.fromisoformat(str(d)[:10])
-                except Exception:
-                    continue
-                if latest_dt is None or dt > latest_dt:
-                    latest_dt = dt
-                    latest = amt
-        return money_state(latest) if latest is not None else "0,00"
-
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        inv = _content(self.coordinator.data.get("invoices") or {})
-        invoices = inv.get("Invoices") or []
-        months: dict[str, Any] = {}
-        for it in invoices:
-            d = it.get("DateIn") or it.get("InvoiceDate") or it.get("date")
-            amt = it.get("Total") or it.get("value") or it.get("amount")
-            if d and amt is not None:
-                try:
-                    dt = datetime.fromisoformat(str(d)[:10])
-                    key = RO_MONTHS.get(dt.month, dt.strftime("%B").lower())
-                    months[key] = money(amt)
-                except Exception:
-                    continue
-        count = len(
-            [
-                k
-                for k in months.keys()
-                if k
-                not in (
-                    "──────────",
-                    "Plăți efectuate",
-                    "Total suma achitată",
-                    "icon",
-                    "friendly_name",
-                )
-            ]
-        )
-        total = 0.0
-        for v in months.values():
-            num = v.replace(" lei", "").replace(".", "").replace(",", ".")
-            try:
-                total += float(num)
-            except Exception:
-                pass
+    _key = "arhiva_facturi"
+    _datasets = ("invoices",)
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        invoices = self._account.invoices
+        # o singură factură pe lună (ultima), pe ultimele 12 luni
+        by_month: dict[str, float] = {}
+        for inv in invoices:
+            if in_last_12_months(inv.date):
+                by_month[RO_MONTHS[inv.date.month]] = inv.amount
+        months: dict[str, Any] = {k: money(v) for k, v in by_month.items()}
         months["──────────"] = ""
-        months["Plăți efectuate"] = count
-        months["Total suma achitată"] = money(total)
+        months["Plăți efectuate"] = len(by_month)
+        months["Total suma achitată"] = money(sum(by_month.values()))
         months["icon"] = "mdi:cash-register"
-        months["friendly_name"] = "Apanova – Arhivă facturi"
-        return months
+        months["friendly_name"] = self._attr_name
+        return money_state(invoices[-1].amount) if invoices else "0,00", months
 
 
 class ApanovaFacturaRestantaSensor(BaseApanovaSensor):
     _attr_icon = "mdi:file-document-alert"
     _attr_name = "Apanova – Valoare factură restantă"
+    _key = "factura_restanta"
+    _datasets = ("unpaid",)
 
-    def __init__(self, coordinator, entry):
-        super().__init__(coordinator, entry)
-        self.entity_id = "sensor.apanova_factura_restanta"
-
-    @property
-    def unique_id(self) -> str:
-        return f"{self._entry.entry_id}_factura_restanta"
+    def rows(self) -> list[dict[str, Any]]:
+        # cele mai noi primele, ca trunchierea compactă să le păstreze pe ele
+        items = sorted(self._account.unpaid, key=lambda it: it.date or datetime.min, reverse=True)
+        return [{"data": it.date and it.date.date().isoformat(), "suma": it.amount} for it in items]
 
-    @property
-    def native_value(self):
-        unpaid = _content(self.coordinator.data.get("unpaid") or {})
-        items = unpaid.get("Invoices") or []
-        latest_val = None
-        latest_dt = None
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        items = self._account.unpaid
+        latest: UnpaidInvoice | None = None
         for it in items:
-            d = it.get("DateIn") or it.get("InvoiceDate") or it.get("date")
-            v = it.get("Sold") or it.get("Total") or it.get("value") or it.get("amount")
-            if v is None:
-                continue
-            dt = None
-            if d:
-                try:
-                    dt = datetime.fromisoformat(str(d)[:10])
-                except Exception:
-                    dt = None
-            if latest_dt is None or (dt and dt > latest_dt):
-                latest_dt = dt
-                latest_val = v
-        return money_state(latest_val) if latest_val is not None else "0,00"
-
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        unpaid = _content(self.coordinator.data.get("unpaid") or {})
-        items = unpaid.get("Invoices") or []
+            if latest is None or latest.date is None or (it.date and it.date > latest.date):
+                latest = it
+        value = money_state(latest.amount) if latest is not None else "0,00"
+        total = money(sum(it.amount for it in items))
+        if self._compact:
+            return value, self._compact_attrs(
+                self.rows(), **{"Plăți restante": len(items), "Total suma neachitată": total}
+            )
         attrs: dict[str, Any] = {}
         if not items:
             attrs["Fara restante"] = ""
-            attrs["──────────"] = ""
-            attrs["Plăți restante"] = 0
-            attrs["Total suma neachitată"] = money(0)
-            attrs["icon"] = "mdi:file-document-alert"
-            attrs["friendly_name"] = "Apanova – Valoare factură restantă"
-            return attrs
-        total = 0.0
-        cnt = 0
-        amounts: list[str] = []
-
-        def get_dt(it):
-            d = it.get("DateIn") or it.get("InvoiceDate") or it.get("date")
-            try:
-                return datetime.fromisoformat(str(d)[:10])
-            except Exception:
-                return datetime.min
-
-        for it in sorted(items, key=get_dt):
-            v = it.get("Sold") or it.get("Total") or it.get("value") or it.get("amount")
-            if v is None:
-                continue
-            cnt += 1
-            total += money_num(v)
-            amounts.append(money(v).replace(" lei", ""))
-        for a in amounts:
-            attrs[a] = ""
+        for it in sorted(items, key=lambda it: it.date or datetime.min):
+            attrs[money_state(it.amount)] = ""
         attrs["──────────"] = ""
-        attrs["Plăți restante"] = cnt
-        attrs["Total suma neachitată"] = money(total)
+        attrs["Plăți restante"] = len(items)
+        attrs["Total suma neachitată"] = total
         attrs["icon"] = "mdi:file-document-alert"
-        attrs["friendly_name"] = "Apanova – Valoare factură restantă"
-        return attrs
+        attrs["friendly_name"] = self._attr_name
+        return value, attrs
 
 
 class ApanovaIndexCurentSensor(BaseApanovaSensor):
     _attr_icon = "mdi:counter"
     _attr_name = "Apanova – Index curent"
-
-    def __init__(self, coordinator, entry):
-        super().__init__(coordinator, entry)
-        self.entity_id = "sensor.apanova_index_curent"
-
-    @property
-    def unique_id(self) -> str:
-        return f"{self._entry.entry_id}_index_curent"
-
-    @property
-    def native_value(self):
-        chk = _content(self.coordinator.data.get("check") or {})
-        details = None
-        if isinstance(chk, dict):
-            details_list = chk.get("MeterReadingDetails") or []
-            if isinstance(details_list, list) and details_list:
-                details = details_list[0]
-        if isinstance(details, dict):
-            v = details.get("LastIndex")
-            try:
-                return int(v)
-            except Exception:
-                try:
-                    return float(v) if v is not None else None
-                except Exception:
-                    return v
-        return None
-
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        chk = _content(self.coordinator.data.get("check") or {})
-        details = None
-        if isinstance(chk, dict):
-            details_list = chk.get("MeterReadingDetails") or []
-            if isinstance(details_list, list) and details_list:
-                details = details_list[0]
-
-        def pick(o, *ks):
-            for k in ks:
-                if isinstance(o, dict) and k in o and o[k] is not None:
-                    return o[k]
-            return None
-
-        return {
-            "cod_loc_consum": pick(details or {}, "ConsumptionPointIdentifier"),
-            "ultima_citire": pick(details or {}, "LastIndexDate"),
-            "contor": pick(details or {}, "Sernr"),
-            "fereastra_index": pick(details or {}, "Inperioada"),
-            "IsSmart": pick(details or {}, "IsSmart"),
+    _key = "index_curent"
+    _datasets = ("check",)
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        reading = self._account.reading(self._contor)
+        return reading and reading.last_index, {
+            "cod_loc_consum": reading and reading.consumption_point,
+            "ultima_citire": reading and reading.last_index_date,
+            "contor": reading and reading.meter,
+            "fereastra_index": reading and reading.in_window,
+            "IsSmart": reading and reading.is_smart,
             "icon": "mdi:counter",
-            "friendly_name": "Apanova – Index curent",
+            "friendly_name": self._attr_name,
         }
 
 
+def _short_label(dt: datetime | None) -> str:
+    if not dt:
+        return ""
+    return f"{dt.day:02d} {RO_MONTHS_SHORT[dt.month]}"
+
+
 class ApanovaIstoricIndexSensor(BaseApanovaSensor):
     _attr_icon = "mdi:counter"
     _attr_name = "Apanova – Istoric index"
+    _key = "istoric_index"
+    _datasets = ("index_history",)
+
+    def rows(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "start": p.start and p.start.date().isoformat(),
+                "sfarsit": p.end.date().isoformat(),
+                "index": p.index,
+                "consum": p.consumption,
+            }
+            for p in reversed(self._periods())
+        ]
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        recent = [p for p in self._periods() if in_last_12_months(p.end)]
+        nums = [p.index for p in recent if isinstance(p.index, int | float)]
+        if self._compact:
+            return max(nums) if nums else None, self._compact_attrs(self.rows())
+        attrs: dict[str, Any] = {}
+        for p in reversed(recent):
+            cons = "" if p.consumption is None else str(p.consumption)
+            attrs[f"{_short_label(p.start)} - {_short_label(p.end)} | {p.index} | {cons}"] = ""
+        attrs["friendly_name"] = self._attr_name
+        attrs["icon"] = "mdi:counter"
+        return max(nums) if nums else None, attrs
+
+
+class ApanovaConsumZilnicSensor(BaseApanovaSensor):
+    """Consumul zilnic mediu (m³/zi) din istoricul de index, cu comparația an/an."""
+
+    _attr_icon = "mdi:water-outline"
+    _attr_name = "Apanova – Consum zilnic"
+    _attr_native_unit_of_measurement = "m³/zi"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _key = "consum_zilnic"
+    _datasets = ("index_history",)
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        key = self._history_key()
+        stats = self.coordinator.analytics.meter(key, self._periods()) if key else None
+        if stats is None or not stats.periods:
+            return None, {"icon": self._attr_icon, "friendly_name": self._attr_name}
+        return stats.rolling_daily, {
+            "ultima_perioada": stats.last_daily,
+            "medie_rulanta": stats.rolling_daily,
+            "variatie_an_pct": stats.yoy_pct,
+            "zile_perioada": stats.typical_days,
+            "perioade": stats.periods,
+            "icon": self._attr_icon,
+            "friendly_name": self._attr_name,
+        }
 
-    def __init__(self, coordinator, entry):
-        super().__init__(coordinator, entry)
-        self.entity_id = "sensor.apanova_istoric_index"
 
-    @property
-    def unique_id(self) -> str:
-        return f"{self._entry.entry_id}_istoric_index"
+class ApanovaAlertaConsumSensor(BaseApanovaSensor):
+    """Semnalare pe consumul zilnic: normal / anomalie (vârf) / scurgere (creștere susținută)."""
+
+    _attr_icon = "mdi:water-alert"
+    _attr_name = "Apanova – Alertă consum"
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = ["normal", "anomalie", "scurgere"]
+    _key = "alerta_consum"
+    _datasets = ("index_history",)
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        key = self._history_key()
+        stats = self.coordinator.analytics.meter(key, self._periods()) if key else None
+        attrs = {"icon": self._attr_icon, "friendly_name": self._attr_name}
+        if stats is None or stats.periods < ANALYTICS_MIN_PERIODS:
+            return None, attrs
+        value = "scurgere" if stats.leak else "anomalie" if stats.anomaly else "normal"
+        return value, {
+            "scor_z": stats.zscore,
+            "anomalie": stats.anomaly,
+            "posibila_scurgere": stats.leak,
+            **attrs,
+        }
 
-    @property
-    def native_value(self):
-        attrs = self.extra_state_attributes
-        nums = []
-        for k in attrs.keys():
-            if " | " in k:
-                parts = [p.strip() for p in k.split("|")]
-                if len(parts) >= 2:
-                    try:
-                        nums.append(int(parts[1]))
-                    except Exception:
-                        try:
-                            nums.append(float(parts[1].replace(",", ".")))
-                        except Exception:
-                            pass
-        return max(nums) if nums else None
 
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        d = self.coordinator.data
-        hist = _content(d.get("index_history") or {})
-        attrs: dict[str, Any] = {}
-        try:
-            points = hist.get("ConsumptionPoints") or []
-            if points:
-                by_meter = points[0].get("IndexHistoryByMeter") or []
-                if by_meter:
-                    entries = by_meter[0].get("MeterIndexList") or []
-                    parsed = []
-                    for it in entries:
-                        sd = it.get("StartDate") or it.get("Start")
-                        ed = it.get("EndDate") or it.get("Date")
-                        idx = it.get("Index")
-                        cons = it.get("Consumption") or it.get("Cons")
-                        if not (ed and idx):
-                            continue
-                        try:
-                            sdt = datetime.fromisoformat(str(sd)[:10]) if sd else None
-                            edt = datetime.fromisoformat(str(ed)[:10])
-                            parsed.append((sdt, edt, idx, cons))
-                        except Exception:
-                            continue
-                    parsed.sort(key=lambda x: x[1])  # EndDate asc
-
-                    def label(dt):
-                        if not dt:
-                            return ""
-                        return (
-                            dt.strftime("%d %b")
-                            .replace("May", "Mai")
-                            .replace("Jul", "Iul")
-                            .replace("Jun", "Iun")
-                            .replace("Aug", "Aug")
-                            .replace("Sep", "Sep")
-                            .replace("Oct", "Oct")
-                            .replace("Nov", "Noi")
-                            .replace("Dec", "Dec")
-                            .replace("Jan", "Ian")
-                            .replace("Feb", "Feb")
-                            .replace("Mar", "Mar")
-                            .replace("Apr", "Apr")
-                        )
-
-                    for sdt, edt, idx, cons in reversed(parsed):
-                        idxv = idx
-                        try:
-                            idxv = int(idx)
-                        except Exception:
-                            try:
-                                idxv = float(str(idx).replace(",", "."))
-                            except Exception:
-                                idxv = idx
-                        consv = ""
-                        if cons is not None:
-                            try:
-                                consv = str(int(cons))
-                            except Exception:
-                                try:
-                                    consv = str(float(str(cons).replace(",", ".")))
-                                except Exception:
-                                    consv = str(cons)
-                        attrs[f"{label(sdt)} - {label(edt)} | {idxv} | {consv}"] = ""
-        except Exception:
-            pass
-        attrs["friendly_name"] = "Apanova – Istoric index"
-        attrs["icon"] = "mdi:counter"
-        return attrs
+class ApanovaFacturaEstimataSensor(BaseApanovaSensor):
+    """Următoarea factură estimată: consumul mediu recent × tariful derivat din facturi."""
+
+    _attr_icon = "mdi:cash-clock"
+    _attr_name = "Apanova – Factură estimată"
+    _key = "factura_estimata"
+    _datasets = ("index_history", "invoices")
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        estimate = self.coordinator.analytics.projection(self._account)
+        attrs = {"icon": self._attr_icon, "friendly_name": self._attr_name}
+        if estimate is None:
+            return None, attrs
+        return money_state(estimate["amount"]), {
+            "tarif_m3": money(estimate["tariff"]),
+            "consum_estimat_m3": estimate["consumption"],
+            "facturat_12_luni": money(estimate["billed"]),
+            "consum_12_luni_m3": estimate["billed_consumption"],
+            **attrs,
+        }
 
 
 class ApanovaCalitateApaSensor(BaseApanovaSensor):
     _attr_icon = "mdi:counter"
     _attr_name = "Apanova – Calitate apa"
+    _key = "calitate_apa"
+    _datasets = ("water",)
+
+    def rows(self) -> list[dict[str, Any]]:
+        return [
+            {"sector": it.sector, "clor": it.clor, "ph": it.ph, "turbiditate": it.turbidity}
+            for it in self.coordinator.model.samples
+        ]
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        water = self.coordinator.model
+        if self._compact:
+            return water.last_update, self._compact_attrs(self.rows())
+        attrs: dict[str, Any] = {}
+        attrs["Sector \t | Clor |  PH  | Turbiditate"] = ""
+        for it in water.samples:
+            attrs[f"{it.sector} | {it.clor} | {it.ph} | {it.turbidity}"] = ""
+        if water.last_update:
+            attrs[f"Last update: {water.last_update}"] = ""
+        attrs["friendly_name"] = self._attr_name
+        attrs["icon"] = "mdi:counter"
+        return water.last_update, attrs
 
-    def __init__(self, coordinator, entry):
-        super().__init__(coordinator, entry)
-        self.entity_id = "sensor.apanova_calitate_apa"
 
-    @property
-    def unique_id(self) -> str:
-        return f"{self._entry.entry_id}_calitate_apa"
+class ApanovaMetricsSensor(BaseApanovaSensor):
+    """Durata ultimului refresh; atribute: contoarele per endpoint ale clientului și
+    planificarea următoarelor încărcări."""
 
-    @property
-    def native_value(self):
-        water = _content(self.coordinator.data.get("water") or {})
-        return water.get("LastUpdateDate")
+    _attr_icon = "mdi:timer-outline"
+    _attr_name = "Apanova – Diagnostic API"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _unrecorded_attributes = frozenset({"endpoints", "counters", "next_fetch"})
+    _key = "diagnostic_api"
 
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        water = _content(self.coordinator.data.get("water") or {})
-        details = water.get("WaterDetails") or []
-        attrs: dict[str, Any] = {}
-        attrs["Sector \t | Clor |  PH  | Turbiditate"] = ""
-        for it in details:
-            sector = it.get("Sector")
-            clor = it.get("Clor")
-            ph = it.get("PH")
-            turb = it.get("Turbiditate")
-            attrs[f"{sector} | {clor} | {ph} | {turb}"] = ""
-        if water.get("LastUpdateDate"):
-            attrs[f"Last update: {water.get('LastUpdateDate')}"] = ""
-        attrs["friendly_name"] = "Apanova – Calitate apa"
-        attrs["icon"] = "mdi:counter"
-        return attrs
+    def __init__(self, coordinator, entry, client):
+        super().__init__(coordinator, entry)
+        self._metrics = client.metrics
+
+    def _revision(self) -> tuple[int, int]:
+        # planificarea (next_fetch) se actualizează după refresh, deci are propria versiune
+        return self._metrics.revision, self.coordinator.scheduler.version
+
+    def _compute(self) -> tuple[Any, dict[str, Any]]:
+        m = self._metrics.as_dict()
+        scheduler = self.coordinator.scheduler
+        next_fetch = {
+            n: datetime.fromtimestamp(scheduler.next_fetch(n)).isoformat(timespec="seconds")
+            for n in scheduler.datasets
+        }
+        return m["refresh"]["last_s"], {
+            "refresh_count": m["refresh"]["count"],
+            "refresh_avg_s": m["refresh"]["avg_s"],
+            "counters": m["counters"],
+            "endpoints": {
+                name: {k: ep[k] for k in ("calls", "errors", "avg_ms", "max_ms", "bytes")}
+                for name, ep in m["endpoints"].items()
+            },
+            "next_fetch": next_fetch,
+            "billing_mode": self.coordinator.billing["mode"],
+            "next_invoice_expected": self.coordinator.billing["next_invoice"],
+            "poll_mode": self.coordinator.poll_mode,
+            "icon": self._attr_icon,
+            "friendly_name": self._attr_name,
+        }
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self._metrics.add_listener(self._handle_coordinator_update))
+        self.async_on_remove(
+            self.coordinator.scheduler.add_listener(self._handle_coordinator_update)
+        )
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.const import UnitOfVolume
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
+
+from .const import DOMAIN, STATISTICS_CURRENCY
+from .models import ApanovaModel, IndexPeriod, Invoice
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def statistic_id(kind: str, *parts: Any) -> str:
+    """Id-ul statisticii externe, de forma `apanova_ro:<kind>_<parti>`."""
+    return f"{DOMAIN}:{kind}_" + "_".join(slugify(str(p)) for p in parts if p is not None)
+
+
+def _start(day: datetime) -> datetime:
+    # statisticile sunt orare; miezul nopții local este aliniat la oră
+    return dt_util.start_of_local_day(day)
+
+
+def index_rows(periods: tuple[IndexPeriod, ...]) -> list[StatisticData]:
+    """Indexul (state) și consumul cumulat (sum), câte un rând la data de sfârșit a perioadei."""
+    rows: dict[datetime, StatisticData] = {}
+    total = 0.0
+    previous = None
+    for p in periods:
+        if not isinstance(p.index, int | float):
+            continue
+        cons = p.consumption
+        if not isinstance(cons, int | float):
+            cons = max(p.index - previous, 0) if previous is not None else 0
+        previous = p.index
+        total += cons
+        start = _start(p.end)
+        rows[start] = StatisticData(start=start, state=float(p.index), sum=total)
+    return list(rows.values())
+
+
+def invoice_rows(invoices: tuple[Invoice, ...]) -> list[StatisticData]:
+    """Valoarea facturilor din ziua emiterii (state) și totalul facturat cumulat (sum)."""
+    rows: dict[datetime, StatisticData] = {}
+    total = 0.0
+    for inv in invoices:
+        total += inv.amount
+        start = _start(inv.date)
+        day = rows.get(start)
+        state = inv.amount + (day["state"] if day else 0.0)
+        rows[start] = StatisticData(start=start, state=state, sum=total)
+    return list(rows.values())
+
+
+class StatisticsImporter:
+    """Trimite istoricul de index și facturile în statisticile pe termen lung.
+
+    Importul e incremental: se trimit doar rândurile de după ultimul rând deja importat,
+    dacă suma cumulată a acestuia coincide; altfel (ex. backfill de ani vechi) se retrimite
+    toată seria, pe care recorder-ul o suprascrie după `start`.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        # statistic_id -> (timestamp, sum) al ultimului rând importat
+        self._last: dict[str, tuple[float, float] | None] = {}
+        self._lock = asyncio.Lock()
+
+    async def async_import(self, model: ApanovaModel) -> None:
+        async with self._lock:
+            for cod, account in model.accounts.items():
+                for key, periods in account.history.items():
+                    _, loc, contor = key.split("|", 2)
+                    meta = StatisticMetaData(
+                        has_mean=False,
+                        has_sum=True,
+                        name=f"Apanova consum apă {contor}",
+                        source=DOMAIN,
+                        statistic_id=statistic_id("consum", cod, loc, contor),
+                        unit_of_measurement=UnitOfVolume.CUBIC_METERS,
+                    )
+                    await self._import(meta, index_rows(periods))
+                meta = StatisticMetaData(
+                    has_mean=False,
+                    has_sum=True,
+                    name=f"Apanova facturi {cod.lstrip('0')}",
+                    source=DOMAIN,
+                    statistic_id=statistic_id("facturi", cod),
+                    unit_of_measurement=STATISTICS_CURRENCY,
+                )
+                await self._import(meta, invoice_rows(account.invoices))
+
+    async def _last_imported(self, sid: str) -> tuple[float, float] | None:
+        if sid not in self._last:
+            last = await get_instance(self._hass).async_add_executor_job(
+                get_last_statistics, self._hass, 1, sid, False, {"sum"}
+            )
+            row = (last.get(sid) or [None])[0]
+            self._last[sid] = (row["start"], row["sum"] or 0.0) if row else None
+        return self._last[sid]
+
+    async def _import(self, meta: StatisticMetaData, rows: list[StatisticData]) -> None:
+        if not rows:
+            return
+        sid = meta["statistic_id"]
+        last = await self._last_imported(sid)
+        if last is not None:
+            ts, total = last
+            for i, row in enumerate(rows):
+                if row["start"].timestamp() == ts and abs(row["sum"] - total) < 1e-6:
+                    rows = rows[i + 1 :]
+                    break
+        if rows:
+            _LOGGER.debug("Import %d statistici în %s", len(rows), sid)
+            async_add_external_statistics(self._hass, meta, rows)
+            self._last[sid] = (rows[-1]["start"].timestamp(), rows[-1]["sum"])
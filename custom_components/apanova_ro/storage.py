@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CACHE_MAX_AGE_HOURS,
+    CACHE_SAVE_DELAY,
+    CACHE_STORAGE_VERSION,
+    DATASET_TIERS,
+    DOMAIN,
+    STORAGE_VERSION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _CacheStore(Store[dict[str, Any]]):
+    async def _async_migrate_func(self, old_major_version, old_minor_version, old_data):
+        # cache-ul se poate reface oricând din API: formatele vechi sunt pur și simplu ignorate
+        return {}
+
+
+class ResponseCache:
+    """Ultimul răspuns bun pentru fiecare set de date, persistat în .storage.
+
+    La pornire, senzorii sunt populați din cache, iar refresh-ul rulează în fundal
+    (stale-while-revalidate). Intrările mai vechi decât CACHE_MAX_AGE_HOURS pentru
+    tier-ul lor sunt eliminate la încărcare.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        self._store: Store[dict[str, Any]] = _CacheStore(
+            hass, CACHE_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.cache"
+        )
+        self._entries: dict[str, dict[str, Any]] = {}
+
+    async def async_load(self) -> None:
+        raw = await self._store.async_load() or {}
+        now = time.time()
+        entries: dict[str, dict[str, Any]] = {}
+        for name, entry in (raw.get("entries") or {}).items():
+            tier = DATASET_TIERS.get(name)
+            if tier is None or not isinstance(entry, dict):
+                continue
+            if now - float(entry.get("ts") or 0) > CACHE_MAX_AGE_HOURS[tier] * 3600:
+                _LOGGER.debug("Apanova cache: elimin '%s' (expirat)", name)
+                continue
+            entries[name] = entry
+        self._entries = entries
+
+    def get(self, name: str) -> tuple[Any, float] | None:
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        return entry.get("data"), float(entry.get("ts") or 0)
+
+    def put(self, name: str, data: Any, ts: float | None = None) -> None:
+        self._entries[name] = {"data": data, "ts": time.time() if ts is None else ts}
+        self._store.async_delay_save(self._data_to_save, CACHE_SAVE_DELAY)
+
+    def timestamps(self) -> dict[str, float]:
+        return {name: float(entry.get("ts") or 0) for name, entry in self._entries.items()}
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {"entries": self._entries}
+
+    async def async_remove(self) -> None:
+        self._entries = {}
+        await self._store.async_remove()
+
+
+class AuthStore:
+    """Tokenul, user id-ul și varianta de login reușită, păstrate între reporniri."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.auth", private=True
+        )
+        self._data: dict[str, Any] = {}
+
+    async def async_load(self) -> dict[str, Any]:
+        self._data = await self._store.async_load() or {}
+        return self._data
+
+    def save(self, data: dict[str, Any]) -> None:
+        self._data = data
+        self._store.async_delay_save(lambda: self._data, CACHE_SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        self._data = {}
+        await self._store.async_remove()
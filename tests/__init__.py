@@ -0,0 +1 @@
+"""Teste pentru integrarea Apanova."""
@@ -0,0 +1,50 @@
+"""Utilitare comune testelor: clientul Apanova legat de serverul local din benchmarks."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+from urllib.parse import urlsplit
+
+from benchmarks.mock_server import MockApanova, MockConfig, RewritingSession
+from custom_components.apanova_ro.api import ApanovaClient
+from custom_components.apanova_ro.const import BREAKER_FAILURES, BREAKER_MAX_RESET, BREAKER_RESET
+from custom_components.apanova_ro.hub import CircuitBreaker
+
+
+def quiet(**kwargs) -> MockConfig:
+    """Server fără latență; `kwargs` configurează erorile injectate."""
+    return MockConfig(latency_ms=0, jitter_ms=0, **kwargs)
+
+
+@asynccontextmanager
+async def mock_client(
+    config: MockConfig, **kwargs: Any
+) -> AsyncIterator[tuple[ApanovaClient, MockApanova, dict[str, CircuitBreaker]]]:
+    """Client legat de serverul local, cu câte o siguranță pe gazdă (ca în hub).
+
+    `kwargs` ajung la ApanovaClient (ex. history).
+    """
+    mock = MockApanova(config)
+    session = RewritingSession(await mock.start())
+    breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(url: str) -> CircuitBreaker:
+        host = urlsplit(url).hostname or ""
+        return breakers.setdefault(
+            host, CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET, BREAKER_MAX_RESET)
+        )
+
+    client = ApanovaClient(
+        None,
+        {"email": "test@example.com", "password": "x"},
+        session=session,
+        breaker=breaker,
+        **kwargs,
+    )
+    try:
+        yield client, mock, breakers
+    finally:
+        await session.close()
+        await mock.stop()
@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+import pytest
+
+from custom_components.apanova_ro import api
+
+
+@pytest.fixture(autouse=True)
+def no_retry_pause(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Reîncercările rulează fără pauze (backoff-ul ar încetini testele)."""
+    monkeypatch.setattr(api, "RETRY_BASE_DELAY", 0.0)
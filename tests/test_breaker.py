@@ -0,0 +1,132 @@
+"""Siguranța per gazdă și interacțiunea ei cu reîncercările clientului."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.mock_server import GATEWAY
+from custom_components.apanova_ro import hub
+from custom_components.apanova_ro.api import ApanovaError
+from custom_components.apanova_ro.const import BREAKER_FAILURES, RETRY_ATTEMPTS
+from custom_components.apanova_ro.hub import CircuitBreaker
+
+from .common import mock_client, quiet
+
+WATER = f"{GATEWAY}/api/v2/apiwater/quality"
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(hub, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker(3, 60.0, 240.0)
+
+
+def test_opens_after_consecutive_failures(clock) -> None:
+    b = _breaker()
+    for _ in range(2):
+        b.record(False)
+    assert b.state == CircuitBreaker.CLOSED and b.allow()
+    b.record(False)
+    assert b.state == CircuitBreaker.OPEN
+    assert not b.allow()
+    assert b.retry_in == 60.0
+
+
+def test_success_resets_failure_count(clock) -> None:
+    b = _breaker()
+    b.record(False)
+    b.record(False)
+    b.record(True)
+    b.record(False)
+    b.record(False)
+    assert b.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_a_single_probe(clock) -> None:
+    b = _breaker()
+    for _ in range(3):
+        b.record(False)
+    clock.now += 60
+    assert b.allow()
+    assert b.state == CircuitBreaker.HALF_OPEN
+    assert not b.allow()
+    b.record(True)
+    assert b.state == CircuitBreaker.CLOSED
+    assert b.as_dict()["failures"] == 0
+
+
+def test_failed_probe_doubles_pause_up_to_cap(clock) -> None:
+    b = _breaker()
+    for _ in range(3):
+        b.record(False)
+    for expected in (120.0, 240.0, 240.0):
+        clock.now += b.retry_in
+        assert b.allow()
+        b.record(False)
+        assert b.state == CircuitBreaker.OPEN
+        assert b.retry_in == expected
+
+
+def test_aborted_probe_can_be_retried_at_once(clock) -> None:
+    b = _breaker()
+    for _ in range(3):
+        b.record(False)
+    clock.now += 60
+    assert b.allow()
+    b.abort()
+    assert b.state == CircuitBreaker.OPEN
+    assert b.allow()
+
+
+def test_abort_while_closed_changes_nothing(clock) -> None:
+    b = _breaker()
+    b.record(False)
+    b.abort()
+    assert b.as_dict() == {"state": CircuitBreaker.CLOSED, "failures": 1, "retry_in": 0.0}
+
+
+async def test_failing_endpoint_does_not_open_host_breaker() -> None:
+    config = quiet(failing_endpoints=("apiclientindexhistory",))
+    async with mock_client(config) as (client, mock, breakers):
+        data = await client.refresh()
+        assert any(k.startswith("index_history") for k in client.last_errors)
+        # destule 500 cât să deschidă siguranța, dacă s-ar număra fiecare încercare
+        assert mock.requests[f"{GATEWAY}/api/v2/apiclientindexhistory"] >= BREAKER_FAILURES
+        assert breakers[GATEWAY].state == CircuitBreaker.CLOSED
+        await client.refresh(["unpaid", "check"], data)
+        assert not client.last_errors
+
+
+async def test_server_error_of_one_endpoint_is_not_a_host_failure() -> None:
+    async with mock_client(quiet(failing_endpoints=("apiwater",))) as (client, _, breakers):
+        for _ in range(BREAKER_FAILURES + 1):
+            with pytest.raises(ApanovaError):
+                await client.get_water_quality()
+        assert breakers[GATEWAY].state == CircuitBreaker.CLOSED
+
+
+async def test_breaker_counts_requests_not_attempts() -> None:
+    config = quiet(failing_endpoints=("apiwater",), failure_status=503)
+    async with mock_client(config) as (client, mock, breakers):
+        with pytest.raises(ApanovaError):
+            await client.get_water_quality()
+        assert mock.requests[WATER] == RETRY_ATTEMPTS["gateway"]
+        assert breakers[GATEWAY].as_dict()["failures"] == 1
+        assert breakers[GATEWAY].state == CircuitBreaker.CLOSED
+
+        for _ in range(BREAKER_FAILURES - 1):
+            with pytest.raises(ApanovaError):
+                await client.get_water_quality()
+        assert breakers[GATEWAY].state == CircuitBreaker.OPEN
+
+        sent = mock.requests[WATER]
+        with pytest.raises(ApanovaError, match="circuit deschis"):
+            await client.get_water_quality()
+        assert mock.requests[WATER] == sent
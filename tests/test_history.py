@@ -0,0 +1,96 @@
+"""Istoricul local multi-anual: închiderea anilor, corecturi, backfill."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from benchmarks.mock_server import GATEWAY
+from custom_components.apanova_ro.const import HISTORY_MAX_YEARS
+from custom_components.apanova_ro.history import KIND_INDEX, KIND_INVOICES, HistoryStore
+
+from .common import mock_client, quiet
+
+INVOICES = f"{GATEWAY}/api/v2/apiclientinvoices"
+
+
+@pytest.fixture
+def history(hass) -> HistoryStore:
+    return HistoryStore(hass, "test")
+
+
+def _invoice(number: str, day: str, total: str) -> dict:
+    return {"InvoiceNumber": number, "DateIn": day, "Total": total}
+
+
+def _period(start: str, end: str, index: str) -> dict:
+    return {"StartDate": start, "EndDate": end, "Index": index}
+
+
+def test_january_closes_last_year_first(history: HistoryStore) -> None:
+    # decembrie: 2025 e anul curent, actualizat incremental
+    history.merge(KIND_INVOICES, "1", 2025, [_invoice("A1", "2025-11-05", "10")])
+    assert history.next_backfill_year(KIND_INVOICES, "1", 2025) == 2024
+    # ianuarie: 2025 a rămas deschis, deci se descarcă întreg înainte de backfill
+    assert history.next_backfill_year(KIND_INVOICES, "1", 2026) == 2025
+    history.merge(
+        KIND_INVOICES,
+        "1",
+        2025,
+        [_invoice("A1", "2025-11-05", "10"), _invoice("A2", "2025-12-05", "12")],
+        closed=True,
+    )
+    assert history.next_backfill_year(KIND_INVOICES, "1", 2026) == 2024
+    assert [it["InvoiceNumber"] for it in history.items(KIND_INVOICES, "1")] == ["A1", "A2"]
+
+
+def test_corrected_items_replace_stored_ones(history: HistoryStore) -> None:
+    assert history.merge(KIND_INVOICES, "1", 2026, [_invoice("A1", "2026-01-05", "10")])
+    assert history.merge(KIND_INVOICES, "1", 2026, [_invoice("A1", "2026-01-05", "11")])
+    assert not history.merge(KIND_INVOICES, "1", 2026, [_invoice("A1", "2026-01-05", "11")])
+    assert history.items(KIND_INVOICES, "1") == [_invoice("A1", "2026-01-05", "11")]
+
+    key = "1|L|M"
+    history.merge(KIND_INDEX, key, 2026, [_period("2026-01-01", "2026-02-01", "100")])
+    history.merge(KIND_INDEX, key, 2026, [_period("2026-01-01", "2026-02-01", "98")])
+    assert history.items(KIND_INDEX, key) == [_period("2026-01-01", "2026-02-01", "98")]
+    assert history.last_date(KIND_INDEX, key, 2026) == "2026-02-01"
+
+
+def test_closed_year_is_immutable(history: HistoryStore) -> None:
+    history.merge(KIND_INVOICES, "1", 2024, [_invoice("A1", "2024-03-05", "10")], closed=True)
+    assert not history.merge(KIND_INVOICES, "1", 2024, [_invoice("A1", "2024-03-05", "99")])
+    assert history.items(KIND_INVOICES, "1") == [_invoice("A1", "2024-03-05", "10")]
+
+
+def test_backfill_stops_when_exhausted(history: HistoryStore) -> None:
+    history.merge(KIND_INVOICES, "1", 2025, [_invoice("A1", "2025-03-05", "10")], closed=True)
+    assert history.next_backfill_year(KIND_INVOICES, "1", 2026) == 2024
+    history.mark_exhausted(KIND_INVOICES, "1")
+    assert history.next_backfill_year(KIND_INVOICES, "1", 2026) is None
+
+
+def test_backfill_stops_at_max_years(history: HistoryStore) -> None:
+    year = 2026
+    for back in range(year - 1, year - HISTORY_MAX_YEARS - 1, -1):
+        assert history.next_backfill_year(KIND_INVOICES, "1", year) == back
+        history.merge(KIND_INVOICES, "1", back, [_invoice(f"A{back}", f"{back}-03-05", "1")], True)
+    assert history.next_backfill_year(KIND_INVOICES, "1", year) is None
+
+
+async def test_client_backfills_one_year_per_refresh(history: HistoryStore) -> None:
+    year = datetime.now().year
+    async with mock_client(quiet(years=3), history=history) as (client, mock, _):
+        data = await client.refresh()
+        cod = data["codes"][0]
+        # mock-ul are facturi pentru anul curent și cei doi anteriori, apoi nimic
+        for expected in (year - 2, year - 3, None):
+            assert history.next_backfill_year(KIND_INVOICES, cod, year) == expected
+            data = await client.refresh(["invoices"], data)
+        mock.reset()
+        data = await client.refresh(["invoices"], data)
+        # doar delta anului curent; backfill-ul s-a încheiat
+        assert mock.requests[INVOICES] == 1
+        years = {inv["DateIn"][:4] for inv in data["invoices"][cod]["Invoices"]}
+        assert years == {str(y) for y in (year, year - 1, year - 2)}
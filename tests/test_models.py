@@ -0,0 +1,22 @@
+"""Modelul tipizat construit din datele brute."""
+
+from __future__ import annotations
+
+from custom_components.apanova_ro.models import Account, MeterReading
+
+
+def _reading(meter: str, index: int) -> MeterReading:
+    return MeterReading(meter, f"L-{meter}", index, "2026-01-01", False, False)
+
+
+def test_reading_of_unknown_meter_is_none() -> None:
+    acc = Account(cod="1", readings=(_reading("M1", 10), _reading("M2", 20)))
+    assert acc.reading("M2").last_index == 20
+    # alt contor nu împrumută citirea primului
+    assert acc.reading("M3") is None
+
+
+def test_reading_without_meter_falls_back_to_first() -> None:
+    acc = Account(cod="1", readings=(_reading("M1", 10),))
+    assert acc.reading(None).meter == "M1"
+    assert Account(cod="1").reading(None) is None
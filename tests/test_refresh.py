@@ -0,0 +1,46 @@
+"""Refresh-ul clientului contra serverului local."""
+
+from __future__ import annotations
+
+from .common import mock_client, quiet
+
+
+async def test_dataset_never_loaded_stays_missing() -> None:
+    config = quiet(failing_endpoints=("apiclientunpaidinvoices",))
+    async with mock_client(config) as (client, _, _):
+        data = await client.refresh()
+        assert any(k.startswith("unpaid") for k in client.last_errors)
+        # fără substitut gol: senzorul de restanțe rămâne indisponibil, nu „fără restanțe”
+        assert "unpaid" not in data
+        assert data["invoices"]
+
+
+async def test_failed_reload_keeps_previous_data() -> None:
+    async with mock_client(quiet()) as (client, mock, _):
+        data = await client.refresh()
+        unpaid = data["unpaid"]
+        mock.config.failing_endpoints = ("apiclientunpaidinvoices",)
+        data = await client.refresh(["unpaid"], data)
+        assert client.last_errors
+        assert data["unpaid"] == unpaid
+
+
+async def test_validators_keep_one_slot_per_endpoint_and_code() -> None:
+    async with mock_client(quiet(years=6)) as (client, mock, _):
+        data = await client.refresh()
+        cod = data["codes"][0]
+        loc, contor = data["meters"][cod][0]
+        slots = len(client._validators)
+        # ani de backfill și ferestre delta: fiecare cerere o singură dată
+        for year in range(2020, 2026):
+            await client.get_invoices_year(cod, year)
+            await client.get_index_history(cod, loc, contor, year)
+        for day in range(1, 6):
+            await client.get_invoices_range(cod, f"2026-01-0{day}", "2026-12-31")
+        assert len(client._validators) == slots
+
+
+async def test_unchanged_response_reuses_decoded_payload() -> None:
+    async with mock_client(quiet()) as (client, _, _):
+        first = await client.get_water_quality()
+        assert await client.get_water_quality() is first
@@ -0,0 +1,79 @@
+"""Planificarea încărcărilor: TTL-uri, versiuni, scadențe și ciclul de facturare."""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from custom_components.apanova_ro.const import AFTER_PAYMENT_TTL_MINUTES
+from custom_components.apanova_ro.coordinator import DataCoordinator
+from custom_components.apanova_ro.scheduler import RefreshScheduler, next_issue
+
+TIERS = {"codes": "static", "unpaid": "billing", "check": "volatile"}
+
+
+def test_set_ttl_changes_version_only_when_ttl_changes() -> None:
+    s = RefreshScheduler(TIERS)
+    calls = []
+    s.add_listener(lambda: calls.append(s.version))
+    s.set_ttl("unpaid", 600)
+    s.set_ttl("unpaid", 600)
+    assert s.ttl("unpaid") == 600
+    s.set_ttl("unpaid", None)
+    s.set_ttl("unpaid", None)
+    assert calls == [1, 2]
+
+
+def test_due_mark_fetched_and_invalidate() -> None:
+    s = RefreshScheduler(TIERS)
+    now = 10_000_000.0
+    assert set(s.due(now)) == set(TIERS)
+    s.mark_fetched(TIERS, now)
+    assert s.due(now + 60) == []
+    version = s.version
+    s.invalidate("unpaid")
+    assert s.due(now + 60) == ["unpaid"]
+    assert s.version == version + 1
+
+
+def test_next_due_considers_only_given_names() -> None:
+    s = RefreshScheduler(TIERS)
+    now = 10_000_000.0
+    s.mark_fetched(["codes", "check"], now)
+    assert s.next_due(now) == 0.0
+    assert s.next_due(now, names=["codes", "check"]) == s.ttl("check")
+    assert s.next_due(now, names=[]) == float("inf")
+
+
+def test_next_issue_from_median_gap() -> None:
+    dates = [datetime(2026, m, 5) for m in range(1, 10)]
+    # intervalul median e 31 de zile: 5 sept. + 31
+    assert next_issue(dates, date(2026, 9, 20)) == date(2026, 10, 6)
+    # după fereastra densă a unei facturi lipsă se estimează următoarea
+    assert next_issue(dates, date(2026, 10, 20)) == date(2026, 11, 6)
+    assert next_issue(dates[:2], date(2026, 9, 20)) is None
+
+
+def _data(payments: list[str]) -> dict:
+    invoices = [{"DateIn": f"2026-{m:02d}-05", "Total": "10"} for m in range(1, 10)]
+    return {
+        "codes": ["1"],
+        "invoices": {"1": {"Invoices": invoices}},
+        "payments": {"1": {"Payments": [{"PaymentDate": d, "Amount": 1} for d in payments]}},
+    }
+
+
+async def test_after_payment_window_does_not_churn_unpaid_ttl(hass) -> None:
+    coordinator = DataCoordinator(hass, SimpleNamespace())
+    now = datetime(2026, 10, 20, 12).timestamp()
+    coordinator.data = _data(["2026-09-01"])
+    coordinator._adapt_billing(now)
+    coordinator.data = _data(["2026-09-01", "2026-10-20"])
+    coordinator._adapt_billing(now + 60)
+    assert coordinator.billing["after_payment"]
+    assert coordinator.scheduler.ttl("unpaid") == AFTER_PAYMENT_TTL_MINUTES * 60
+    # tick-urile următoare din fereastră nu mai schimbă planificarea
+    version = coordinator.scheduler.version
+    for tick in range(2, 5):
+        coordinator._adapt_billing(now + tick * 60)
+    assert coordinator.scheduler.version == version